@@ -0,0 +1,45 @@
+"""Import and app construction time of dash_express.
+
+Every measurement runs in a fresh interpreter, the best of --repeat runs is reported:
+
+    python benchmarks/import_time.py --repeat 5
+
+For a per-module breakdown use: python -X importtime -c "import dash_express"
+"""
+import sys
+import argparse
+import subprocess
+
+
+CASES = {
+    'import dash': 'import dash',
+    'import dash_express': 'import dash_express',
+    'DashExpress()': 'import dash_express; dash_express.DashExpress()',
+    'DashExpress() + Page': 'import dash_express; app = dash_express.DashExpress(); dash_express.Page(app, "/")',
+}
+
+HEAVY = ['pandas', 'numpy', 'dash_leaflet', 'plotly.io', 'dash_express.kpi', 'dash_express.preview_chart']
+
+
+def measure(code, repeat):
+    script = ('import time, sys; start = time.perf_counter(); %s; '
+              'print(time.perf_counter() - start); print(",".join(m for m in %r if m in sys.modules))') % (code, HEAVY)
+    best, loaded = None, ''
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout.split('\n')
+        seconds, loaded = float(out[0]), out[1]
+        best = seconds if best == None else min(best, seconds)
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    for name, code in CASES.items():
+        seconds, loaded = measure(code, args.repeat)
+        print(f'{name:<24} {seconds * 1000:8.1f} ms   heavy modules: {loaded or "-"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Smoke test of the load test against a live server (python -m dash_express.loadtest --url).
+
+The synthetic app is served by python -m dash_express.serve in its own process, the load test
+builds the same app in another process and replays the requests, every request must succeed:
+
+    python benchmarks/loadtest_smoke.py --requests 200
+"""
+import os
+import sys
+import socket
+import argparse
+import tempfile
+import subprocess
+
+
+APP = '''from dash_express.loadtest import build_app
+app = build_app(pages={pages}, charts={charts}, kpis={kpis}, rows={rows})
+'''
+
+
+def _free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pages', type=int, default=2)
+    parser.add_argument('--charts', type=int, default=2)
+    parser.add_argument('--kpis', type=int, default=2)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--host', default='127.0.0.1')
+    args = parser.parse_args()
+    options = ['--pages', args.pages, '--charts', args.charts, '--kpis', args.kpis, '--rows', args.rows]
+    port = _free_port(args.host)
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join([os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                        os.environ.get('PYTHONPATH', '')])}
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'smoke_app.py'), 'w') as file:
+            file.write(APP.format(**vars(args)))
+        server = subprocess.Popen([sys.executable, '-m', 'dash_express.serve', 'smoke_app:app', '--host', args.host,
+                                   '--port', str(port), '--workers', '2'], cwd=directory, env=env)
+        try:
+            load = subprocess.run([sys.executable, '-m', 'dash_express.loadtest', '--url', f'http://{args.host}:{port}/',
+                                   '--requests', str(args.requests), '--max-errors', '0', *map(str, options)],
+                                  cwd=directory, env=env)
+        finally:
+            server.terminate()
+            server.wait(30)
+    sys.exit(load.returncode)
+
+
+if __name__ == '__main__':
+    main()
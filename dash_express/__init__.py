@@ -1,26 +1,39 @@
 import os
+import gc
 import json
+import hmac
+import time
+import hashlib
 import uuid
+import inspect
+import tempfile
 import random
+import threading
 import orjson
 
-import numpy as np
-import pandas as pd
-import dash_leaflet as dl
+from contextlib import contextmanager
+
 import plotly.graph_objects as go
 import dash_mantine_components as dmc
 
 
 from .version import V
-from .kpi import KPI, FastKPI
-from .filters import autofilter
+from . import _aio
+from ._state import filters_hash, filter_values, cross_values, cross_origin
+from ._lru import LRUCache
+from ._http import ResponseLayer
+from ._singleflight import SingleFlight
+from ._admission import Admission
+from ._source import DataSource
+from .serializers import get_serializer
+from ._assets import ClientBundle
 from flask_caching import Cache
+from flask import g, has_app_context, has_request_context, request, jsonify, Response
 from dash_iconify import DashIconify
-from .preview_chart import _render_wrapper
 from dash.exceptions import PreventUpdate
 from dash._jupyter import JupyterDisplayMode
 from ._app_shell import BaseAppShell, AsideAppShell
-from dash import Dash, Output, Input, State, ALL, dcc, html, Patch, MATCH
+from dash import Dash, Output, Input, State, ALL, dcc, html, dash_table, Patch, MATCH, ClientsideFunction, callback_context, no_update
 
 
 _default_index = """<!DOCTYPE html>
@@ -45,6 +58,61 @@ _default_index = """<!DOCTYPE html>
 </html>"""
 
 
+def _diskcache_manager():
+    """Get a local background callback manager"""
+    try:
+        import diskcache
+        from dash import DiskcacheManager
+    except ImportError as error:
+        raise ImportError(
+            "To use background=True without background_callback_manager, you need to install dash[diskcache]") from error
+    return DiskcacheManager(diskcache.Cache(os.path.join(tempfile.gettempdir(), 'dash_express_background')))
+
+
+def _frame_size(value):
+    version, df = value
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _empty_frame(version=None):
+    import pandas as pd
+    return pd.DataFrame()
+
+
+def _sample(df, positions, size):
+    """Uniform sample of the rows (at the positions) in the original order"""
+    import numpy as np
+    total = len(df) if positions is None else len(positions)
+    chosen = np.sort(np.random.default_rng(total).choice(total, size, replace=False))
+    sample = df.iloc[chosen if positions is None else positions[chosen]]
+    sample.attrs = {**df.attrs, 'dash_express_sample': total}
+    return sample
+
+
+def _rescaled(sample, mask):
+    """Filter a sample, the estimated rows of the exact result shrink with the rows of the sample"""
+    part = sample[mask]
+    total = sample.attrs['dash_express_sample'] * len(part) / max(len(sample), 1)
+    part.attrs = {**sample.attrs, 'dash_express_sample': int(round(total))}
+    return part
+
+
+def _state_hash(values):
+    """Get filters_hash of the values, the same dict is hashed once per request"""
+    if not has_app_context():
+        return filters_hash(values)
+    hashes = g.setdefault('dash_express_hashes', {})
+    cached = hashes.get(id(values))
+    if cached == None or cached[0] is not values:
+        cached = hashes[id(values)] = (values, filters_hash(values))
+    return cached[1]
+
+
+def _output_ids():
+    """Get the ids of the graph, kpi, geojson (and approximate marker) outputs of the render callback"""
+    return [[output['id'] for output in outputs] for outputs in callback_context.outputs_list]
+
+
 class DashExpress(Dash):
     """The DashExpress object implements a Dash application with a pre-configured 
     interface and automatic generation of callbacks to quickly create interactive 
@@ -67,6 +135,53 @@ class DashExpress(Dash):
 
     :param app_shell: Appshell class for customization UI your app
     :type app_shell: AppShell instance
+
+    :param access_cache_key: function returning the current session/user identity, 
+        access_func decisions are cached per identity for access_cache_timeout seconds (default: None, cache per request only)
+    :type access_cache_key: function
+
+    :param access_cache_timeout: access decisions cache timeout in seconds (default: 60)
+    :type access_cache_timeout: int
+
+    :param filter_cache_size: how many filtered DataFrames and render results are kept in memory 
+        per page, keyed by the filter state hash and the data version (default: 8, 0 disables)
+    :type filter_cache_size: int
+
+    :param frame_serializer: how DataFrames are stored in the app cache: 'pickle' (default), 
+        'arrow' (Arrow IPC with LZ4, memory-mapped files for FileSystemCache, requires pyarrow) 
+        or a serializer instance, see dash_express.serializers
+    :type frame_serializer: string
+
+    :param local_cache_bytes: the size of the in-process cache of loaded DataFrames in front of 
+        the app cache, a DataFrame is deserialized from the app cache once per data version and 
+        process (default: 512 MB, 0 disables)
+    :type local_cache_bytes: int
+
+    :param invalidate_token: secret token of the POST ``_dash-express/invalidate`` endpoint 
+        which refreshes the data of a page (``?page=/url``) or of all pages and of the GET 
+        ``_dash-express/metrics`` endpoint, the token is sent in the ``Authorization: Bearer <token>`` 
+        header (default: None, no endpoints)
+    :type invalidate_token: string
+
+    :param memory_budget: bytes the concurrent renders and downloads of a process may use, estimated 
+        from the rows left by the filters. Requests wait for the memory, renders above the budget 
+        are computed on a sample of the rows (default: None, unlimited)
+    :type memory_budget: int
+
+    :param session_budget: bytes the concurrent renders and downloads of one session may use, the session 
+        is identified by access_cache_key or the client address (default: None, unlimited)
+    :type session_budget: int
+
+    :param admission_timeout: seconds a request waits for the memory and the concurrency limit 
+        of its page before it is degraded or rejected (default: 10)
+    :type admission_timeout: int
+
+    :param background: run page rendering and downloads as background callbacks with progress 
+        and cancellation of superseded filter states, uses background_callback_manager or 
+        a local DiskcacheManager (default: False). The jobs run in other processes, the cache 
+        must be shared (FileSystemCache, RedisCache). DiskcacheManager starts a process per job, 
+        the in-process caches are not kept between jobs, CeleryManager workers keep them
+    :type background: bool
     
     -------------------------------
 
@@ -151,10 +266,15 @@ class DashExpress(Dash):
         If ``False`` we will use CDN links where available.
     :type serve_locally: boolean
 
-    :param compress: Use gzip to compress files and data served by Flask.
-        To use this option, you need to install dash[compress]
-        Default ``False``
-    :type compress: boolean
+    :param compress: ``'builtin'``: compress responses above ``compress_threshold`` bytes 
+        with brotli (if installed) or gzip and answer repeated GET requests (index, layout, 
+        scripts) with 304 Not Modified.
+        ``True``: use flask_compress, you need to install dash[compress]
+        ``None`` (default) or ``False``: no compression
+    :type compress: boolean or string
+
+    :param compress_threshold: the minimum size in bytes of a compressed response (default: 1024)
+    :type compress_threshold: int
 
     :param meta_tags: html <meta> tags to be added to the index page.
         Each dict should have the attributes and values for one tag, eg:
@@ -227,23 +347,43 @@ class DashExpress(Dash):
     :param add_log_handler: Automatically add a StreamHandler to the app logger
         if not added previously."""
 
-    def __init__(self, logo='DashExpress', cache=True, default_cache_timeout=3600, app_shell=BaseAppShell(), name=None, server=True, assets_folder="assets", pages_folder="pages", 
+    def __init__(self, logo='DashExpress', cache=True, default_cache_timeout=3600, app_shell=BaseAppShell(), 
+                 access_cache_key=None, access_cache_timeout=60, filter_cache_size=8, frame_serializer=None, local_cache_bytes=2**29,
+                 invalidate_token=None, memory_budget=None, session_budget=None, admission_timeout=10, background=False, name=None, server=True, assets_folder="assets", pages_folder="pages", 
                  use_pages=None, assets_url_path="assets", assets_ignore="", assets_external_path=None, eager_loading=False, 
                  include_assets_files=True, include_pages_meta=True, url_base_pathname=None, requests_pathname_prefix=None, 
-                 routes_pathname_prefix=None, serve_locally=True, compress=None, meta_tags=None, index_string=_default_index, 
+                 routes_pathname_prefix=None, serve_locally=True, compress=None, compress_threshold=1024, meta_tags=None, index_string=_default_index, 
                  external_scripts=None, external_stylesheets=None, suppress_callback_exceptions=None, prevent_initial_callbacks=False, 
                  show_undo_redo=False, extra_hot_reload_paths=None, plugins=None, title="Dash", update_title="Updating...", 
                  long_callback_manager=None, background_callback_manager=None, add_log_handler=True, **obsolete):
+        self.bundle = ClientBundle()
+        self.background = background
+        self.invalidate_token = invalidate_token
+        if background and background_callback_manager == None and long_callback_manager == None:
+            background_callback_manager = _diskcache_manager()
         super().__init__(name, server, assets_folder, pages_folder, use_pages, assets_url_path, assets_ignore, assets_external_path, 
                          eager_loading, include_assets_files, include_pages_meta, url_base_pathname, requests_pathname_prefix, 
-                         routes_pathname_prefix, serve_locally, compress, meta_tags, index_string, external_scripts, 
+                         routes_pathname_prefix, serve_locally, compress != 'builtin' and compress, meta_tags, index_string, external_scripts, 
                          external_stylesheets, suppress_callback_exceptions, prevent_initial_callbacks, show_undo_redo, 
                          extra_hot_reload_paths, plugins, title, update_title, long_callback_manager, background_callback_manager, 
                          add_log_handler, **obsolete)
         self.PAGES = {}
+        self.SOURCES = {}
+        if compress == 'builtin':
+            self.response_layer = ResponseLayer(threshold=compress_threshold)
+            self.response_layer.init_app(self.server)
         self.app_shell = app_shell
         self.app_shell.LOGO = logo
         self.default_cache_timeout = default_cache_timeout
+        self.access_cache_key = access_cache_key
+        self.access_cache_timeout = access_cache_timeout
+        self.filter_cache_size = filter_cache_size
+        self.frame_serializer = get_serializer(frame_serializer)
+        # Deserialized DataFrames of the current data versions, one per page
+        self.LOCAL_FRAMES = LRUCache(1024 if local_cache_bytes else 0, maxbytes=local_cache_bytes, sizeof=_frame_size)
+        # DataFrames loaded by preload, they are kept whatever their size until the data version changes
+        self.PINNED_FRAMES = {}
+        self._layout_cache = {}
         if isinstance(cache, Cache):
             self.cache = cache
         elif isinstance(cache, bool) and cache == True:
@@ -252,65 +392,361 @@ class DashExpress(Dash):
             self.cache = Cache(self.server, config=cache)
         else:
             raise ValueError("cache must be a flask_caching.Cache or a boolean")
+        # One computation of a cold cache entry across threads and workers
+        self.single_flight = SingleFlight(self.cache)
+        self.admission = Admission(memory_budget, session_budget, admission_timeout)
+        if background and self.single_flight.mode == 'local':
+            raise ValueError("background=True runs the callbacks in other processes, use a cache shared between them, "
+                             "e.g. cache={'CACHE_TYPE': 'FileSystemCache', 'CACHE_DIR': ...} or RedisCache")
+        # Diskcache jobs run in new processes, what they add to the in-process caches is lost with them
+        self._job_processes = False
+        if background:
+            from dash import DiskcacheManager
+            self._job_processes = isinstance(self._background_manager, DiskcacheManager)
+        if self._job_processes:
+            self.logger.warning('background=True with DiskcacheManager: the in-process caches (local data tier, '
+                                'filtered frames, render results) are not kept between jobs, use CeleryManager '
+                                'to keep them in the workers')
+        
+    def _setup_routes(self):
+        super()._setup_routes()
+        self._add_url(ClientBundle.URL_PATH + '<path:filename>', self.bundle.serve)
+        if self.invalidate_token:
+            self._add_url(ClientBundle.URL_PATH + 'invalidate', self._invalidate_view, methods=('POST',))
+            self._add_url(ClientBundle.URL_PATH + 'metrics', self._metrics_view)
+
+    def _authorized(self):
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {self.invalidate_token}')
+
+    def _invalidate_view(self):
+        if not self._authorized():
+            return Response('Unauthorized', status=401)
+        url = request.args.get('page')
+        if url != None and url not in self.PAGES:
+            return Response('Page not found', status=404)
+        return jsonify(self.invalidate(url, full=request.args.get('full') in ('1', 'true')))
+
+    def _metrics_view(self):
+        if not self._authorized():
+            return Response('Unauthorized', status=401)
+        return jsonify(self.admission.metrics())
+
+    def _session(self):
+        """Identity of the session for session_budget"""
+        if not has_request_context():
+            return None
+        if self.access_cache_key != None:
+            return self.access_cache_key()
+        return request.remote_addr
+
+    def invalidate(self, url=None, full=False):
+        """Refresh the data of the page (all pages if url is None).
+
+        The data version of the page is bumped, the DataFrame, filtered frames, render results
+        and downloads of the previous version are no longer used by any process sharing the cache.
+
+        :param url: page url, e.g. '/sales'
+        :param full: reload the data with get_df for pages with get_new_rows
         
+        Returns the new data versions {url: version}"""
+        pages = self.PAGES.values() if url == None else [self.PAGES[url]]
+        return {page.URL: page.invalidate(full) for page in pages}
+
+    def add_source(self, name, get_df, optimize=False, get_new_rows=None, append_key=None):
+        """Add a named data source which several pages can use: Page(app, '/sales', source='sales').
+
+        The DataFrame is loaded and cached once for all its pages, they share the filter indexes 
+        and statistics. A page can take a projection of the columns without copying: 
+        Page(app, '/prices', source='sales', columns=['date', 'price']).
+        The parameters are the same as for Page.register_frame
+
+        Returns the DataSource"""
+        self.SOURCES[name] = DataSource(self, f'Source: {name}', get_df, optimize, get_new_rows, append_key)
+        return self.SOURCES[name]
+
+    def _register_bundle(self):
+        """Build the client bundle and add it to the page scripts"""
+        scripts = self.config.external_scripts
+        if self.bundle.filename and self.bundle.src(self) in scripts:
+            scripts.remove(self.bundle.src(self))
+        self.bundle.build()
+        scripts.append(self.bundle.src(self))
+
+    def clientside_function(self, name, clientside_function, output, *args, **kwargs):
+        """Register a clientside callback whose code is served in the cached client bundle
+
+        :param name: function name in the dash_clientside.dash_express namespace
+        :param clientside_function: JavaScript function source
+        
+        The other arguments are the same as for Dash.clientside_callback"""
+        self.bundle.add_function(name, clientside_function)
+        return self.clientside_callback(
+            ClientsideFunction(ClientBundle.NAMESPACE, name), output, *args, **kwargs)
+
     def _app_shell(self):
         self.layout = self.app_shell._app_provider(self)
 
     def register_page(self, Page):
         self.PAGES[Page.URL] = Page
 
+    def build_layout(self):
+        """Build the layout payload for the access rights of the current user"""
+        dict1 = {k: v.render()
+                for k, v in self.PAGES.items() if v.is_accessible()}
+        dict2 = {k: v.preview()for k, v in self.PAGES.items()
+                if not v.is_accessible() and v.access_mode == 'view'}
+        dict3 = {'#error': [None, self.app_shell.error_page(self)]}
+
+        meta = {k:v.metatags() for k, v in self.PAGES.items()}
+        # Strings, the versions are larger than the integers of JavaScript
+        versions = {k: str(v.filters_version) for k, v in self.PAGES.items()}
+
+        return {'content':{**dict1, **dict2, **dict3}, 'navs': self.app_shell._build_navs(self), 'meta':meta,
+                'versions': versions}
+
+    def render_page(self, url, filters, ids, ids_kpi, ids_geo, set_progress=None, cross=None, markers=None, refine=False,
+                    origin=None):
+        """Compute the figures, KPI and maps of the page for the received filters and chart selections.
+
+        The results are cached per filter state and data version, only missing ones are computed.
+        An approximate page answers from its sample and computes the exact results in the background.
+
+        :param markers: ids of the approximate markers and of the refine timers (outputs of the render 
+            callback if a page is approximate), their style and disabled values are returned as two more groups
+        :param refine: wait for the exact results, the refine timer of an approximate page fired
+        :param origin: the graph whose selection alone changed, its figure is not sent again"""
+        page = self.PAGES.get(url)
+        if not page:
+            raise PreventUpdate
+        funcs = {'graph': page.RENDER_FUNC, 'kpi': page.RENDER_FUNC_KPI, 'geo': page.GEOJSON_FUNC}
+        wanted = {kind: [(kind, id.get('id', 'default')) for id in kind_ids]
+                  for kind, kind_ids in zip(funcs, [ids, ids_kpi, ids_geo])}
+        version = page.data_version()
+        cross = page.cross_selection(cross)
+        key = page.state_key(filters, version, cross)
+        # A graph is not filtered by its own selection, its results are cached without it
+        caches = {key: page.RESULTS.setdefault(key, {})}
+        cached = {}
+        for kind_wanted in wanted.values():
+            for kind, id in kind_wanted:
+                item_key = key
+                if kind == 'graph' and id in cross:
+                    item_key = page.state_key(filters, version, {k: v for k, v in cross.items() if k != id})
+                if item_key not in caches:
+                    caches[item_key] = page.RESULTS.setdefault(item_key, {})
+                cached[(kind, id)] = caches[item_key]
+        skipped = {('graph', origin)} if origin in page.CROSSFILTER else set()
+        todo = [w for w, cache in cached.items() if w not in skipped and w not in cache]
+        done = []
+
+        def progress():
+            done.append(1)
+            if set_progress != None:
+                set_progress(round(100 * len(done) / len(todo)))
+
+        def compute():
+            # Renders above the memory budget get a sample of the rows, their results are not cached
+            with page.admit(filters, version) as max_rows:
+                out = {}
+                render(out, lambda exclude: page.crossfiltered(filters, cross, version, exclude, max_rows), progress)
+            if max_rows == None:
+                for w, value in out.items():
+                    cached[w][w] = value
+            return out, max_rows != None
+
+        def approximate():
+            out = {}
+            render(out, lambda exclude: page.approximated(filters, cross, version, exclude), lambda: None)
+            return out, True
+
+        def render(out, filtered, progress):
+            # A graph is not filtered by its own selection
+            frames = {}
+
+            def frame(kind, id):
+                exclude = id if kind == 'graph' and id in cross else None
+                if exclude not in frames:
+                    frames[exclude] = filtered(exclude)
+                # The filtered frame is cached and shared, every function gets its own columns
+                return frames[exclude].copy(deep=False)
+            # Regular functions are called in turn, async ones are awaited together
+            values = []
+            for kind, id in todo:
+                try:
+                    value = funcs[kind].get(id)(frame(kind, id))
+                except Exception as error:
+                    value = error
+                values.append(value)
+                if not inspect.isawaitable(value):
+                    progress()
+            values = _aio.resolve(values, page.render_concurrency, progress)
+
+            for (kind, id), value in zip(todo, values):
+                if kind == 'graph':
+                    if isinstance(value, Exception):
+                        self.logger.error('%s: graph %s failed', page, id, exc_info=value)
+                    fig = go.Figure() if isinstance(value, Exception) else value
+                    value = Patch()
+                    value.data = fig.data
+                    value.layout.xaxis.autorange = True
+                    value.layout.yaxis.autorange = True
+                elif isinstance(value, Exception):
+                    raise value
+                out[(kind, id)] = value
+
+        results, sampled = {}, False
+        if todo and page.approximate and not refine:
+            # The exact results are cached for the refine request, a Diskcache job process 
+            # ends with the request and the refine request computes them itself
+            if not self._job_processes:
+                self._refine(page, (url, key, tuple(todo)), compute)
+            results, sampled = self.single_flight.share((url, key, tuple(todo), 'approximate'), approximate)
+        elif todo:
+            # Identical concurrent requests share one computation
+            results, sampled = self.single_flight.share((url, key, tuple(todo)), compute)
+        if has_request_context() and not sampled:
+            g.dash_express_body_key = hashlib.blake2b(repr((url, key, wanted, origin)).encode(), digest_size=12).hexdigest()
+        values = [[no_update if w in skipped else results[w] if w in results else cached[w][w] for w in kind_wanted]
+                  for kind_wanted in wanted.values()]
+        if markers != None:
+            marker_ids, refine_ids = markers
+            pending = sampled and page.approximate and not refine
+            values += [[({} if sampled else {'display': 'none'}) if id['page'] == url else no_update for id in marker_ids],
+                       [not pending if id['page'] == url else no_update for id in refine_ids]]
+        return values
+
+    def _refine(self, page, key, compute):
+        """Compute the exact results of the latest approximate filter state of the session in the background.
+
+        A session has one refinement of the page at a time, the states superseded while it runs are skipped"""
+        session = self._session()
+        with page._refine_lock:
+            running = session in page.REFINE
+            page.REFINE[session] = (key, compute)
+        if running:
+            return
+
+        def refine():
+            latest = None
+            try:
+                while True:
+                    with page._refine_lock:
+                        if page.REFINE[session] is latest:
+                            del page.REFINE[session]
+                            return
+                        latest = page.REFINE[session]
+                    self.single_flight.share(*latest)
+            except BaseException:
+                # The refine request of the client computes the exact results itself
+                with page._refine_lock:
+                    page.REFINE.pop(session, None)
+                raise
+        self._in_background(refine)
+
+    def _in_background(self, func, *args):
+        """Call the function in a daemon thread with the app context, errors are logged"""
+        def target():
+            with self.server.app_context():
+                try:
+                    func(*args)
+                except PreventUpdate:
+                    pass
+                except Exception:
+                    self.logger.exception('Background computation failed')
+        threading.Thread(target=target, daemon=True).start()
+
     def register_server_callback(self):
         """Register a function callback on the server side"""
         # Send Page.layout to front
         @self.callback(Output("layout-store", 'data'),
                     Input("layout-store", 'data'))
         def send_layout(d):
-            dict1 = {k: v.render()
-                    for k, v in self.PAGES.items() if v.is_accessible()}
-            dict2 = {k: v.preview()for k, v in self.PAGES.items()
-                    if not v.is_accessible() and v.access_mode == 'view'}
-            dict3 = {'#error': [None, self.app_shell.error_page(self)]}
-
-            meta = {k:v.metatags() for k, v in self.PAGES.items()}
-
-            return {'content':{**dict1, **dict2, **dict3}, 'navs': self.app_shell._build_navs(self), 'meta':meta}
+            # Users with the same access signature share one layout payload
+            signature = tuple(page.is_accessible() for page in self.PAGES.values())
+            # The autofilters are rebuilt when the data of their page changes, the data version
+            # of a source is read once per request (see DataSource.data_version)
+            versions = tuple(str(page.refresh_filters()) for page in self.PAGES.values())
+            layout = self._layout_cache.get((signature, versions))
+            if layout is None:
+                self._layout_cache = {key: value for key, value in self._layout_cache.items() if key[1] == versions}
+                layout = self._layout_cache[(signature, versions)] = self.build_layout()
+            g.dash_express_body_key = (f'layout-{self._layout_version}-'
+                                   f'{filters_hash({"access": signature, "versions": versions})}')
+            return layout
 
         # Render Chart
-        @self.callback([Output({'type': 'graph', 'id': ALL}, 'figure'),
+        # The ids of the rendered components are taken from the outputs, not sent as State
+        render_args = [[Output({'type': 'graph', 'id': ALL}, 'figure'),
                         Output({'type': 'kpi', 'id': ALL}, 'children'),
                         Output({'type': "geojson", 'id': ALL}, 'data')],
                     Input('contentfilter-store', 'data'),
-                    State({'type': 'contentfilter-store', 'id': ALL}, 'id'),
-                    State({'type': 'kpifilter-store', 'id': ALL}, 'id'),
-                    State({'type': 'geojsonfilter-store', 'id': ALL}, 'id'),
-                    State("url-store", 'pathname'))
-        def s(filters, ids, ids_kpi, ids_geo, url):
-            page = self.PAGES.get(url)
-            if page:
-                df = page.filtered(filters)
-                res = []
-                kpi = []
-                geo = []
-                for id in ids:
-                    try:
-                        fig = page.RENDER_FUNC.get(
-                            id.get('id', 'default'))(df)
-                    except:
-                        fig = go.Figure()
-                    patched_fig = Patch()
-                    patched_fig.data = fig.data
-                    patched_fig.layout.xaxis.autorange = True
-                    patched_fig.layout.yaxis.autorange = True
-                    res.append(patched_fig)
-                for id in ids_kpi:
-                    k = page.RENDER_FUNC_KPI.get(id.get('id', 'default'))(df)
-                    kpi.append(k)
-                for id in ids_geo:
-                    g = page.GEOJSON_FUNC.get(id.get('id', 'default'))(df)
-                    geo.append(g)
-                return [res, kpi, geo]
-            else:
-                raise PreventUpdate
+                    State("url-store", 'pathname')]
+        if self.APPROXIMATE_OPPORTUNITY:
+            # The markers of approximate results and the timers which ask for the exact results
+            render_args[0] += [Output({'type': 'approximate', 'page': ALL}, 'style'),
+                               Output({'type': 'approximate-refine', 'page': ALL}, 'disabled')]
+            render_args.insert(2, Input({'type': 'approximate-refine', 'page': ALL}, 'n_intervals'))
+
+        def render(state, url, set_progress=None):
+            ids = _output_ids()
+            refine = 'approximate-refine' in callback_context.triggered[0]['prop_id']
+            return self.render_page(url, filter_values(state), *ids[:3], set_progress, cross_values(state), 
+                                    ids[3:] or None, refine, cross_origin(state))
+
+        if self.background:
+            # A superseded job of the same callback is cancelled by the renderer (oldJob),
+            # a job of the previous page is cancelled when the url changes
+            @self.callback(*render_args,
+                           background=True,
+                           progress=Output('render-progress', 'value'),
+                           progress_default=0,
+                           cancel=[Input("url-store", 'pathname')],
+                           running=[(Output('render-progress', 'style'),
+                                     self.app_shell.PROGRESS_STYLE, {**self.app_shell.PROGRESS_STYLE, 'display': 'none'})])
+            def s(set_progress, state, *args):
+                with self.server.app_context():
+                    return render(state, args[-1], set_progress)
+        else:
+            @self.callback(*render_args)
+            def s(state, *args):
+                return render(state, args[-1])
+
+        if self.APPEND_OPPORTUNITY:
+            # Appended rows change the options and limits of the autofilters of an open page,
+            # the user values are kept by the persistence of the filters
+            @self.callback(Output('sidebar-filter', 'children', allow_duplicate=True),
+                           Output('filter-version-store', 'data', allow_duplicate=True),
+                           Input('contentfilter-store', 'data'),
+                           State('filter-version-store', 'data'),
+                           State('url-store', 'pathname'),
+                           prevent_initial_call=True)
+            def refresh_filters(state, version, url):
+                page = self.PAGES.get(url)
+                if not page or not page.is_accessible() or str(page.refresh_filters()) == version:
+                    raise PreventUpdate
+                return page.render()[0], str(page.filters_version)
+
+        if self.TABLE_OPPORTUNITY:
+            # Send the visible page of a table
+            @self.callback(Output({'type': 'table', 'id': MATCH}, 'data'),
+                           Output({'type': 'table', 'id': MATCH}, 'page_count'),
+                           Output({'type': 'table', 'id': MATCH}, 'page_current'),
+                           Input({'type': 'table', 'id': MATCH}, 'page_current'),
+                           Input({'type': 'table', 'id': MATCH}, 'sort_by'),
+                           Input('contentfilter-store', 'data'),
+                           State({'type': 'table', 'id': MATCH}, 'page_size'),
+                           State({'type': 'table', 'id': MATCH}, 'id'),
+                           State("url-store", 'pathname'))
+            def send_table(page_current, sort_by, state, page_size, id, url):
+                page = self.PAGES.get(url)
+                if not page or id['id'] not in page.TABLES:
+                    raise PreventUpdate
+                # New filters or sorting start from the first page
+                if not callback_context.triggered[0]['prop_id'].endswith('.page_current'):
+                    page_current = 0
+                data, page_count = page.table_page(id['id'], filter_values(state), page_current or 0, page_size, 
+                                                     sort_by, cross_values(state))
+                return data, page_count, page_current
 
         if self.DOWNLOAD_OPPORTUNITY:
             # Send DataFrame
@@ -321,6 +757,7 @@ class DashExpress(Dash):
                         State({'type':'download-frame-action','page':MATCH}, 'id'),
                         prevent_initial_call=False,
                         suppress_callback_exceptions=True,
+                        background=self.background,
                         #    running=[
                         #         (Output("download-frame-action", "loading"), True, False),
                         #     ],
@@ -330,8 +767,10 @@ class DashExpress(Dash):
                     raise PreventUpdate
                 page = self.PAGES.get(url.get('page'))
                 if page:
-                    df = page.filtered(filters)
-                    return dcc.send_data_frame(df.to_csv, "qweta_data.csv"), 'gray'
+                    # The frame and its CSV text, a download is never sampled
+                    with self.server.app_context(), page.admit(filter_values(filters), copies=3, degrade=False):
+                        df = page.crossfiltered(filter_values(filters), cross_values(filters))
+                        return dcc.send_data_frame(df.to_csv, "qweta_data.csv"), 'gray'
                 return {}, 'gray'
 
 
@@ -340,16 +779,19 @@ class DashExpress(Dash):
     def register_clientside_callback(self):
         """Register a function callback on the client side"""  
         # Dark Theme
-        self.clientside_callback(
-            """ function(data, figs, maps) {
+        self.bundle.add('templates', 'window.dashExpress = Object.assign(window.dashExpress || {}, {templates: %s});' % json.dumps(
+            dict(dark=self.app_shell.DARK_PLOTLY_TEMPLATES.to_plotly_json(),
+                 light=self.app_shell.LIGHT_PLOTLY_TEMPLATES.to_plotly_json()), separators=(',', ':')))
+        self.clientside_function(
+            'theme',
+            """ function(data, children, figs, maps) {
                     const maplayer = data["colorScheme"] == "dark" ? "%(dark_layer)s" : "%(light_layer)s";
-                    const dark = %(dark)s ;
-                    const light = %(light)s ;
+                    const template = window.dashExpress.templates[data["colorScheme"] == "dark" ? "dark" : "light"];
                     for (var i = 0; i < figs.length; i++) {
-                        figs[i] = Object.assign({}, figs[i], {
+                        figs[i] = figs[i].layout && figs[i].layout.template === template ? dash_clientside.no_update : Object.assign({}, figs[i], {
                             'layout': {
                                 ...figs[i].layout,
-                                'template': data["colorScheme"] == "dark" ?  dark : light}
+                                'template': template}
                                 }
                             );
                         };
@@ -357,10 +799,6 @@ class DashExpress(Dash):
                         maps[i] = maplayer 
                         };
                     return [data,maps,figs] } """ % dict(
-                light=json.dumps(
-                    self.app_shell.LIGHT_PLOTLY_TEMPLATES.to_plotly_json()),
-                dark=json.dumps(
-                    self.app_shell.DARK_PLOTLY_TEMPLATES.to_plotly_json()),
                 dark_layer = self.app_shell.DARK_LEAFLET_TILE,
                 light_layer = self.app_shell.LIGHT_LEAFLET_TILE,
             ),
@@ -368,11 +806,13 @@ class DashExpress(Dash):
             Output(dict(type='map-layer',id=ALL), "url"),
             Output({'type': 'graph', 'id': ALL}, 'figure', allow_duplicate=True),
             Input("theme-store", "data"),
-            Input({'type': 'graph', 'id': ALL}, 'figure'),
+            Input("page_layout", "children"),
+            State({'type': 'graph', 'id': ALL}, 'figure'),
             State(dict(type='map-layer',id=ALL), "url"),
             prevent_initial_call=True
         )
-        self.clientside_callback(
+        self.clientside_function(
+            'toggle_theme',
             """function(n_clicks, n_clicks1, data) {
                 if (data) {
                     if (n_clicks || n_clicks1) {
@@ -390,7 +830,8 @@ class DashExpress(Dash):
             State("theme-store", "data"),
         )
         if isinstance(self.app_shell.LOGO, dict) and self.LOGO.get('type') == 'img':
-            self.clientside_callback(
+            self.clientside_function(
+                'logo',
                 """ function(data) {  
                             const logo = data["colorScheme"] == "dark" ? "%(dark_logo)s" : "%(light_logo)s";
                             return logo;
@@ -404,39 +845,77 @@ class DashExpress(Dash):
             )
     
         # Filters Store
-        self.clientside_callback(
-            '''function f(data, index) {
+        self.clientside_function(
+            'filters_store',
+            '''function f(data, cross, index, previous) {
                 var dct = {};
                 for (var i = 0; i < index.length; i++) {
                 if (data[i] != undefined) {
                     dct[index[i]['id']] = data[i]
                 }
                 };
-                const icon = Object.keys(dct).length == 0 ? "mdi:filter" : "mdi:filter-check";
-                return [dct, icon];
+                cross = cross || {};
+                const icon = Object.keys(dct).length == 0 && Object.keys(cross).length == 0 ? "mdi:filter" : "mdi:filter-check";
+                // The graph whose selection alone changed keeps its figure
+                const before = (previous || {}).cross || {};
+                const changed = [...new Set([...Object.keys(cross), ...Object.keys(before)])].filter(
+                    id => JSON.stringify(cross[id]) != JSON.stringify(before[id]));
+                const same = JSON.stringify(dct) == JSON.stringify((previous || {}).filters || {});
+                const origin = same && changed.length == 1 ? changed[0] : null;
+                return [{filters: dct, cross: cross, origin: origin}, icon];
             }''',
             [Output('contentfilter-store', 'data'),
             Output('filter-wrapper-icon', 'icon')],
             Input({'type': 'filter', 'id': ALL}, 'value'),
-            State({'type': 'filter', 'id': ALL}, 'id'))
+            Input('crossfilter-store', 'data'),
+            State({'type': 'filter', 'id': ALL}, 'id'),
+            State('contentfilter-store', 'data'))
+
+        # Chart selections: {graph id: [values of the selected points]}
+        self.clientside_function(
+            'crossfilter',
+            '''function f(selections, graphs, configs, ids) {
+                var keys = {};
+                for (var i = 0; i < ids.length; i++) {
+                    keys[ids[i]['id']] = configs[i]['key']
+                };
+                var cross = {};
+                for (var i = 0; i < graphs.length; i++) {
+                    const key = keys[graphs[i]['id']];
+                    const points = (selections[i] || {})['points'] || [];
+                    if (key == undefined || points.length == 0) {
+                        continue
+                    };
+                    cross[graphs[i]['id']] = [...new Set(points.map(p => p[key]).filter(v => v != undefined))];
+                };
+                return cross;
+            }''',
+            Output('crossfilter-store', 'data'),
+            Input({'type': 'graph', 'id': ALL}, 'selectedData'),
+            State({'type': 'graph', 'id': ALL}, 'id'),
+            State({'type': 'crossfilter', 'id': ALL}, 'data'),
+            State({'type': 'crossfilter', 'id': ALL}, 'id'))
         
         # Render Page.layout
-        self.clientside_callback(
+        self.clientside_function(
+            'page_layout',
             """ function(url, layout) {             
                 if (layout['meta'][url] != undefined) {
                     document.title = layout['meta'][url]['title'];
                     document.description = layout['meta'][url]['description'];
                 } ;
                 var res = layout['content'][url] == undefined ? layout['content']['#error']:layout['content'][url];            
-                return res } """,
+                return [...res, (layout['versions'] || {})[url]] } """,
             [Output("sidebar-filter", 'children'),
-            Output("page_layout", 'children')],
+            Output("page_layout", 'children'),
+            Output("filter-version-store", 'data')],
             Input("url-store", 'pathname'),
             Input("layout-store", 'data'))
         
         
         # Render Page.layout
-        self.clientside_callback(
+        self.clientside_function(
+            'navs',
             """ function(layout) {                        
                 return [layout['navs']] } """,
             [Output("nav-content", 'children')],
@@ -447,10 +926,54 @@ class DashExpress(Dash):
 
     def compile_layout(self):
         """Compile layout and callback functions"""
+        self._layout_cache = {}
+        self._layout_version = uuid.uuid4().hex
         self._app_shell()
-        self.DOWNLOAD_OPPORTUNITY = np.any([page.download_opportunity for page in self.PAGES.values()])
+        self.DOWNLOAD_OPPORTUNITY = any(page.download_opportunity for page in self.PAGES.values())
+        self.TABLE_OPPORTUNITY = any(len(page.TABLES) > 0 for page in self.PAGES.values())
+        self.APPROXIMATE_OPPORTUNITY = any(page.approximate for page in self.PAGES.values())
+        self.APPEND_OPPORTUNITY = any(page.source.get_new_rows != None and page.AUTOFILTERS for page in self.PAGES.values())
         self.register_clientside_callback()
         self.register_server_callback()
+        self._register_bundle()
+
+    def preload(self, freeze=True):
+        """Prepare the app in the master process before the workers are forked.
+
+        Compiles the layout, loads the DataFrames of all pages and builds the filter indexes 
+        and statistics. The DataFrames are pinned in the process memory regardless of 
+        local_cache_bytes until their data version changes. With freeze=True the frames are laid out for copy-on-write sharing 
+        (see dash_express.optimize.freeze_frame) and the loaded objects are moved out of 
+        the garbage collector's reach (gc.freeze), so the workers share the memory 
+        instead of copying it. Use it with gunicorn --preload or python -m dash_express.serve
+
+        Returns self, e.g. server = app.preload().server"""
+        from .optimize import freeze_frame
+        if not getattr(self, '_layout_version', None):
+            self.compile_layout()
+        with self.server.app_context():
+            frozen = set()
+            for page in self.PAGES.values():
+                if page.source.get_df == None:
+                    continue
+                start = time.perf_counter()
+                # A source shared by several pages is loaded and frozen once
+                if page.source not in frozen:
+                    df = page.source.frame()
+                    if freeze:
+                        df, objects = freeze_frame(df)
+                        if objects:
+                            self.logger.warning('%s: object columns %s are copied by the workers on access, '
+                                                'use pyarrow strings to share them', page.source, objects)
+                    # The pinned frame is shared by the workers, the local tier may not hold it
+                    page.source.pin(df)
+                    frozen.add(page.source)
+                page.warm(page.get_df_func())
+                self.logger.info('%s: preloaded in %.2f s', page, time.perf_counter() - start)
+        if freeze:
+            gc.collect()
+            gc.freeze()
+        return self
 
     def run(self, host=os.getenv("HOST", "127.0.0.1"), port=os.getenv("PORT", "8050"), proxy=os.getenv("DASH_PROXY", None), debug=None,
             jupyter_mode: JupyterDisplayMode = None, jupyter_width="100%", jupyter_height=650, jupyter_server_url=None,
@@ -458,7 +981,9 @@ class DashExpress(Dash):
             dev_tools_hot_reload_interval=None, dev_tools_hot_reload_watch_interval=None, dev_tools_hot_reload_max_retry=None,
             dev_tools_silence_routes_logging=None, dev_tools_prune_errors=None, **flask_run_options):
         
-        self.compile_layout()
+        # The layout may be compiled by preload already
+        if not getattr(self, '_layout_version', None):
+            self.compile_layout()
         return super().run(host, port, proxy, debug, jupyter_mode, jupyter_width, jupyter_height, jupyter_server_url, dev_tools_ui, 
                            dev_tools_props_check, dev_tools_serve_dev_bundles, dev_tools_hot_reload, dev_tools_hot_reload_interval, 
                            dev_tools_hot_reload_watch_interval, dev_tools_hot_reload_max_retry, dev_tools_silence_routes_logging, 
@@ -494,12 +1019,54 @@ class Page(object):
 
         :param download_opportunity: True | False
         :type download_opportunity: bool
+
+        :param render_concurrency: how many async render functions of the page are awaited at the same time
+        :type render_concurrency: int
+
+        :param max_concurrent: how many renders and downloads of the page a process runs at the same time, 
+            the others wait, see DashExpress admission_timeout (default: None, unlimited; 4 on approximate pages)
+        :type max_concurrent: int
+
+        :param memory_budget: bytes one render or download of the page may use, renders above it are 
+            computed on a sample of the rows (default: None, only the budgets of the app apply)
+        :type memory_budget: int
+
+        :param approximate: rows of the stratified sample the page is rendered from at once, the exact results 
+            are computed in the background and replace the approximate ones (default: None, exact rendering)
+        :type approximate: int
+
+        :param approximate_by: the column whose values are the strata of the sample, every value keeps 
+            at least 10 rows in the sample (default: None, a uniform sample)
+        :type approximate_by: string
+
+        :param sketches: columns with HyperLogLog and (numeric) t-digest sketches per stratum, 
+            see Page.distinct and Page.quantile
+        :type sketches: list
+
+        :param source: name of a data source of the app used instead of get_df, see DashExpress.add_source
+        :type source: string
+
+        :param columns: the columns of the source the page works with, the page gets 
+            a view of them without copying (default: None, all columns)
+        :type columns: list
+
+        :param optimize: compact the column types of the loaded DataFrame, True or a dict of 
+            the parameters of dash_express.optimize.optimize_frame, e.g. dict(downcast=True)
+        :type optimize: bool or dict
+
+        :param get_new_rows: function returning the rows added since the previous load, see Page.register_frame
+        :type get_new_rows: function
+
+        :param append_key: the column whose maximum is passed to get_new_rows
+        :type append_key: string
         """  
     def __repr__(self):
         return f'Page: {self.URL}'
 
     def __init__(self, app, url_path, name=None, get_df=None, title=None, description=None,
-                 access_func=None, access_mode='hide', download_opportunity=True,):
+                 access_func=None, access_mode='hide', download_opportunity=True, render_concurrency=10,
+                 optimize=False, get_new_rows=None, append_key=None, max_concurrent=None, memory_budget=None,
+                 approximate=None, approximate_by=None, sketches=None, source=None, columns=None):
         prefix = app.config.get('url_base_pathname') or '/'
         
         self.name = name or 'Page'        
@@ -509,36 +1076,84 @@ class Page(object):
         self.access_func = access_func
         self.access_mode = access_mode
         self.download_opportunity = download_opportunity
+        self.render_concurrency = render_concurrency
+        # The exact computations of an approximate page are bounded by default
+        self.max_concurrent = max_concurrent if max_concurrent != None or not approximate else 4
+        self.memory_budget = memory_budget
+        self.approximate = approximate
+        self.approximate_by = approximate_by
+        self.sketches = sketches or []
+        self.columns = columns
 
         self.RENDER_FUNC = {}
         self.RENDER_FUNC_KPI = {}
         self.GEOJSON_FUNC = {}
+        self.TABLES = {}
+        self.CROSSFILTER = {}
         self.FILTERS = []
         self.FILTERS_FUNC = {}
+        # Autofilter parameters by column: (position in FILTERS, multi, type, label, kwargs)
+        self.AUTOFILTERS = {}
+        self.filters_version = None
+        self.FRAMES = LRUCache(app.filter_cache_size)
+        self.RESULTS = LRUCache(app.filter_cache_size)
+        # The latest approximate state of every session with a running refinement, see DashExpress._refine
+        self.REFINE = {}
+        self._refine_lock = threading.Lock()
+        self.SORTS = LRUCache(app.filter_cache_size)
         self.layout = dmc.Grid()
 
         if isinstance(app, DashExpress):
             self.app = app
-            app.register_page(self)
         else:
             raise ValueError("param app must be a DashExpress app")
         
-        if type(get_df) != type(None):
-            self.register_frame(get_df)
+        if source != None:
+            if get_df != None:
+                raise ValueError("pass either get_df or source")
+            if source not in app.SOURCES:
+                raise ValueError(f"data source {source!r} is not added, see DashExpress.add_source")
+            self.source = app.SOURCES[source]
+            self.get_df_func = self._frame
+        elif type(get_df) != type(None):
+            self.register_frame(get_df, optimize=optimize, get_new_rows=get_new_rows, append_key=append_key)
         else:
-            self.get_df_func = lambda: pd.DataFrame()     
+            self.source = DataSource(app, str(self), None)
+            self.get_df_func = _empty_frame
+        app.register_page(self)
 
     def is_accessible(self):
-        if self.access_func != None:
-            return self.access_func()
-        return True
+        """Check access to the page, the access_func decision is cached per request 
+        and, if the app defines access_cache_key, per session"""
+        if self.access_func == None:
+            return True
+        if not has_request_context():
+            return bool(self.access_func())
+        decisions = g.setdefault('dash_express_access', {})
+        if self.URL not in decisions:
+            decisions[self.URL] = self._access_decision()
+        return decisions[self.URL]
+
+    def _access_decision(self):
+        if self.app.access_cache_key == None:
+            return bool(self.access_func())
+        key = f'{self}/access/{self.app.access_cache_key()}'
+        decision = self.app.cache.get(key)
+        if decision == None:
+            decision = bool(self.access_func())
+            self.app.cache.set(key, decision, timeout=self.app.access_cache_timeout)
+        return decision
 
     def render(self):
         filters = [
             dmc.CardSection(
                 dmc.Group(
                     children=[
-                        dmc.Title('Filters', order=3),
+                        dmc.Group([dmc.Title('Filters', order=3)] + ([
+                            dmc.Badge('approximate', id={'type': 'approximate', 'page': self.URL}, color='gray', 
+                                      variant='outline', style={'display': 'none'}),
+                            dcc.Interval(id={'type': 'approximate-refine', 'page': self.URL}, interval=1000, disabled=True)
+                            ] if self.approximate else []), spacing='xs'),
                         dmc.LoadingOverlay(
                             dmc.Tooltip(
                                 multiline=True,
@@ -596,15 +1211,49 @@ class Page(object):
     def metatags(self):
         return {'title':self.title, 'description':self.description}
    
-    def register_frame(self, get_df):
-        @self.app.cache.cached(timeout = self.app.default_cache_timeout, key_prefix=str(self) + '/')
-        def get_df_func():
-            df = get_df()
-            return df  
-                
-        self.get_df_func = get_df_func
+    def register_frame(self, get_df, optimize=False, get_new_rows=None, append_key=None):
+        """Register the DataFrame function of the page, get_df may be declared with `async def`
+
+        The page gets its own data source, see dash_express._source.DataSource for the caching, 
+        optimize and the incremental loading with get_new_rows(since)"""
+        self.source = DataSource(self.app, str(self), get_df, optimize, get_new_rows, append_key)
+        self.get_df_func = self._frame
+
+    def _frame(self, version=None):
+        """Get the DataFrame of the source, projected to the columns of the page"""
+        df = self.source.frame(version)
+        if self.columns == None:
+            return df
+        return self.source.view(df, self.columns)
+
+    @property
+    def frame_report(self):
+        return self.source.frame_report
+
+    def data_version(self):
+        """Get the data version of the page source.
+
+        The version is a monotonic number shared through the app cache. The DataFrame and 
+        everything derived from it (filtered frames, render results, downloads) are keyed 
+        by the version. It changes on Page.invalidate and when it expires after default_cache_timeout"""
+        return self.source.data_version()
+
+    def invalidate(self, full=False):
+        """Bump the data version of the page source, the data is loaded again on the next request.
+        The pages sharing the source are refreshed as well.
+
+        With get_new_rows the new rows are appended, full=True calls get_df instead.
+
+        Returns the new version"""
+        version = self.source.invalidate(full)
+        for page in self.app.PAGES.values():
+            if page.source is self.source:
+                page.FRAMES.clear()
+                page.RESULTS.clear()
+                page.SORTS.clear()
+        return version
            
-    def add_kpi(self, kpi):
+    def add_kpi(self, kpi, id=None):
         """Add kpi_cards to the layout.
         
         The KPI rendering system is based on the use of the KPI class, which contains a container representation and the logic for calculating the indicator. The simplest implementation of KPI, with automatic generation of the calculation function, is presented in the FastKPI class:
@@ -643,13 +1292,18 @@ class Page(object):
 
         app.add_kpi(MyKPI())
         ```
+
+        id - the id of the card, default a random one. Pass it when the layout is built
+        by several processes without preload, so that their ids match.
+
+        render_func must not change the values of the received DataFrame in place, see Page.add_graph
         """
-        id = str(uuid.uuid4())
+        id = id or str(uuid.uuid4())
         self.RENDER_FUNC_KPI[id] = kpi.render_func
         self.RENDER_FUNC_KPI['default'] = self.render_kpi_wrapper
         return kpi.render_layout(dict(type='kpifilter-store', id=id))
 
-    def add_graph(self, id=None, render_func=None, **kwargs):
+    def add_graph(self, id=None, render_func=None, crossfilter=None, crossfilter_key='x', **kwargs):
         """Add plotly figure to the layout
         
         The Plotly graphing library has more than 50 chart types to choose from. For Dash Express to work, you need to answer 2 questions:
@@ -674,6 +1328,17 @@ class Page(object):
         def bar_func(df):
             return px.bar(df, x="nation", y="count", color="medal", title="Long-Form Input")
         ```
+
+        The function may be declared with `async def`, async functions of the page are awaited concurrently 
+        (at most `render_concurrency` at a time).
+
+        The DataFrame is shared with the other functions and requests: adding or replacing columns
+        changes only the received frame, changing values in place (df.loc[...] = ..., inplace=True) 
+        changes the shared data or, after app.preload(), raises ValueError.
+
+        With crossfilter='column' clicking or box-selecting points of the graph filters the other 
+        components of the page by the column, the values are taken from the crossfilter_key 
+        attribute of the points ('x', 'y', 'label' for pie charts, 'location' for choropleths).
 """
         CONFIG = {
             'modeBarButtonsToRemove': ['pan2d', 'lasso2d',
@@ -694,9 +1359,17 @@ class Page(object):
         self.RENDER_FUNC[id] = render_func
         self.RENDER_FUNC['default'] = self.render_wrapper()
         with self.app.server.app_context():
-            fig = render_func(self.get_df_func())
+            fig = _aio.call(render_func, self.get_df_func().copy(deep=False))
             fig.data = []
-        fig.update_layout(template=self.app.app_shell.DARK_PLOTLY_TEMPLATES)
+        # The template is applied on the client side from the bundle, see register_clientside_callback
+        fig.layout.template = None
+        crossfilter_store = []
+        if crossfilter != None:
+            self.CROSSFILTER[id] = crossfilter
+            # A click selects a point, a click on the selected point or a double click deselects
+            fig.layout.clickmode = 'event+select'
+            CONFIG['modeBarButtonsToRemove'] = [b for b in CONFIG['modeBarButtonsToRemove'] if b != 'select']
+            crossfilter_store = [dcc.Store(id=dict(type='crossfilter', id=id), data={'key': crossfilter_key})]
         return dmc.LoadingOverlay(dmc.Card(
             [
                 dcc.Graph(figure=fig, id=dict(type='graph', id=id),
@@ -705,13 +1378,14 @@ class Page(object):
                                  },
                         config=CONFIG),
 
-                dcc.Store(id=dict(type='contentfilter-store', id=id))
+                dcc.Store(id=dict(type='contentfilter-store', id=id)),
+                *crossfilter_store
             ],
             withBorder=True,
             **kwargs
         ))
 
-    def add_map(self, geojson_func=None, p=0, dl_geojson_kwargs={'zoomToBounds': True}, **kwargs):
+    def add_map(self, geojson_func=None, p=0, dl_geojson_kwargs={'zoomToBounds': True}, id=None, **kwargs):
         """Add a map to the layout
         
         If you use GeoPandas, you can add maps to your dashboard, it's as simple as adding a graph.:
@@ -727,8 +1401,14 @@ class Page(object):
             gdf = gdf[gdf.geometry.geom_type == 'Polygon']
             return gdf.__geo_interface__
         ```
+
+        geojson_func may be declared with `async def`.
+
+        id - the id of the map, default a random one, see Page.add_kpi
         """
-        id = str(uuid.uuid4())
+        # dash_leaflet is imported only by the apps with maps
+        import dash_leaflet as dl
+        id = id or str(uuid.uuid4())
         geojson_func = geojson_func or self.geojson_wrapper
         self.GEOJSON_FUNC[id] = geojson_func
         self.GEOJSON_FUNC['default'] = self.geojson_wrapper
@@ -752,6 +1432,64 @@ class Page(object):
             **kwargs
         ))
 
+    def add_table(self, id=None, columns=None, page_size=20, table_kwargs={}, **kwargs):
+        """Add a table of the filtered rows to the layout
+
+        The rows are paginated and sorted on the server, only the visible page is sent to the browser:
+
+        ```python
+        page.add_table(columns=['country', 'year', 'pop'], page_size=50)
+        ```
+
+        columns - the columns to show, default all columns of the DataFrame.
+        table_kwargs - additional parameters of dash_table.DataTable, kwargs are passed to the card.
+        """
+        id = id or str(uuid.uuid4())
+        if columns == None:
+            with self.app.server.app_context():
+                columns = list(self.get_df_func().columns)
+        self.TABLES[id] = columns
+        return dmc.LoadingOverlay(dmc.Card(
+            dash_table.DataTable(
+                id=dict(type='table', id=id),
+                columns=[{'name': str(col), 'id': str(col)} for col in columns],
+                data=[],
+                page_action='custom',
+                page_current=0,
+                page_size=page_size,
+                sort_action='custom',
+                sort_mode='multi',
+                sort_by=[],
+                style_table={'overflowX': 'auto'},
+                style_header={'fontWeight': 'bold'},
+                **table_kwargs),
+            withBorder=True,
+            **kwargs
+        ))
+
+    def table_page(self, id, filters, page_current, page_size, sort_by=None, cross=None):
+        """Get the records of a table page and the number of pages.
+
+        Sorting uses a permutation of the filtered rows, cached per filter state, data version and sort order"""
+        version = self.data_version()
+        key = self.state_key(filters, version, self.cross_selection(cross))
+        df = self.crossfiltered(filters, cross, version)
+        columns = {str(col): col for col in self.TABLES[id]}
+        sort = tuple((columns[s['column_id']], s['direction'] == 'asc') for s in sort_by or [] 
+                     if s['column_id'] in columns)
+        start, stop = page_current * page_size, (page_current + 1) * page_size
+        if sort:
+            positions = self.SORTS.get((key, sort))
+            if positions is None:
+                cols = [col for col, _ in sort]
+                positions = self.SORTS.set((key, sort), df[cols].reset_index(drop=True).sort_values(
+                    cols, ascending=[asc for _, asc in sort], kind='stable', na_position='last').index.to_numpy())
+            rows = df.iloc[positions[start:stop]]
+        else:
+            rows = df.iloc[start:stop]
+        records = rows[list(columns.values())].rename(columns=str).to_dict('records')
+        return records, max(1, -(-len(df) // page_size))
+
     def add_autofilter(self, col,  multi=False, type='auto', label='auto', **kwargs):
         """Add filter to the layout with automatic generation.
         
@@ -765,11 +1503,27 @@ class Page(object):
         filter_func, f = self._add_autofilter(
             col, multi, type, label, **kwargs)
         self.FILTERS_FUNC[col] = filter_func
+        self.AUTOFILTERS[col] = (len(self.FILTERS), multi, type, label, kwargs)
         self.FILTERS.append(f)
 
+    def refresh_filters(self):
+        """Rebuild the autofilters (select options, slider and date limits) if the data version changed, 
+        e.g. after new rows were appended.
+
+        Returns the data version the autofilters are built from"""
+        if self.AUTOFILTERS and self.data_version() != self.filters_version:
+            filters = list(self.FILTERS)
+            for col, (position, multi, type, label, kwargs) in self.AUTOFILTERS.items():
+                filters[position] = self._add_autofilter(col, multi, type, label, **kwargs)[1]
+            self.FILTERS = filters
+        return self.filters_version
+
     def _add_autofilter(self, col, multi=False, type='auto', label='auto', **kwargs):
+        from .filters.autofilter import autofilter
         with self.app.server.app_context():
-            serias = self.get_df_func()[col]
+            df = self.get_df_func()
+            self.filters_version = df.attrs.get('dash_express_version')
+            serias = df[col]
             if type == 'auto':
                 data_type = str(serias.dtype)
                 for dtype in ['int', 'float', 'object', 'str', 'datetime', 'category']:
@@ -784,17 +1538,253 @@ class Page(object):
                         return autofilter(type, serias, col, multi, label=label, **kwargs)
             return autofilter(type, serias, col, multi, label=label, **kwargs)
 
-    def filtered(self, filters):
-        """Filter data by received constraints"""
-        df = self.get_df_func()
-        for k, v in filters.items():
-            if v == None or (type(v) == type(list()) and len(v) == 0):
-                continue
-            df = df[self.FILTERS_FUNC[k](df[k], v)]
+    def state_key(self, filters, version=None, cross=None):
+        """Get the cache key of the filter state: (data version, filters hash[, chart selections hash])"""
+        key = (version or self.data_version(), _state_hash(filters))
+        return key + (_state_hash(cross),) if cross else key
+
+    def cross_selection(self, cross):
+        """Get the selections of the page graphs with crossfilter: {graph id: [values]}"""
+        return {id: values for id, values in (cross or {}).items() if id in self.CROSSFILTER and values}
+
+    def crossfiltered(self, filters, cross, version=None, exclude=None, max_rows=None):
+        """Filter data by received constraints and chart selections.
+
+        The selections are applied to the cached frame of the filters, so a new selection 
+        filters only the rows left by the filters.
+
+        :param exclude: the graph whose selection is not applied
+        :param max_rows: see Page.filtered"""
+        version = version or self.data_version()
+        df = self.filtered(filters, version, max_rows)
+        cross = {id: values for id, values in self.cross_selection(cross).items() if id != exclude}
+        if not cross:
+            return df
+        key = self.state_key(filters, version, cross)
+        cached = None if 'dash_express_sample' in df.attrs else self.FRAMES.get(key)
+        if cached is None:
+            import numpy as np
+            from .filters.filterfunc import multiselect_filters
+            mask = np.ones(len(df), dtype=bool)
+            for id, values in cross.items():
+                mask &= np.asarray(multiselect_filters(df[self.CROSSFILTER[id]], values))
+            if 'dash_express_sample' in df.attrs:
+                return _rescaled(df, mask)
+            cached = self.FRAMES.set(key, df[mask])
+        return cached
+
+    def filtered(self, filters, version=None, max_rows=None):
+        """Filter data by received constraints.
+
+        The result is cached per filter state and data version, render functions must not modify it in place.
+
+        :param max_rows: if more rows are left, a uniform sample of max_rows rows (in the original order) 
+            is returned, it is not cached and has the total number of rows in attrs['dash_express_sample']"""
+        version = version or self.data_version()
+        key = self.state_key(filters, version)
+        df = self.FRAMES.get(key)
+        if df is None:
+            df = self._filtered(filters, version, max_rows)
+            if 'dash_express_sample' not in df.attrs:
+                self.FRAMES.set(key, df)
+        elif max_rows != None and len(df) > max_rows:
+            df = _sample(df, None, max_rows)
         return df
 
+    def _active(self, filters):
+        return [(k, v, self.FILTERS_FUNC[k]) for k, v in filters.items() 
+                if not (v == None or (type(v) == type(list()) and len(v) == 0))]
+
+    def _filtered(self, filters, version=None, max_rows=None):
+        import numpy as np
+        df = self.get_df_func(version)
+        active = self._active(filters)
+        if not active:
+            return df if max_rows == None or len(df) <= max_rows else _sample(df, None, max_rows)
+        # The most selective filter runs over all rows, the others only over the rows left
+        if len(active) > 1:
+            active.sort(key=lambda f: self._selectivity(df, *f))
+        positions = None
+        for k, v, func in active:
+            if positions is None:
+                if hasattr(func, 'index'):
+                    m = func(df[k], v, index=self._filter_stats(df, k, func.index))
+                else:
+                    m = func(df[k], v)
+                positions = np.flatnonzero(np.asarray(m))
+            else:
+                positions = positions[np.asarray(func(df[k].iloc[positions], v))]
+            if len(positions) == 0:
+                break
+        if max_rows != None and len(positions) > max_rows:
+            return _sample(df, positions, max_rows)
+        return df.iloc[positions]
+
+    def approximated(self, filters, cross=None, version=None, exclude=None):
+        """Filter the stratified sample of the data by received constraints and chart selections, see Page approximate.
+
+        The estimated rows of the exact result are in attrs['dash_express_sample'] (see approximate.scale). 
+        If only whole strata are selected, they are in attrs['dash_express_strata'] (None for all) 
+        and Page.distinct and Page.quantile answer from the sketches"""
+        import numpy as np
+        from .filters.filterfunc import multiselect_filters
+        version = version or self.data_version()
+        sample = self._sample(self.get_df_func(version))
+        active = self._active(filters)
+        cross = {id: values for id, values in self.cross_selection(cross).items() if id != exclude}
+        mask = np.ones(len(sample), dtype=bool)
+        for k, v, func in active:
+            mask &= np.asarray(func(sample[k], v))
+        for id, values in cross.items():
+            mask &= np.asarray(multiselect_filters(sample[self.CROSSFILTER[id]], values))
+        df = _rescaled(sample, mask)
+        if not cross and all(k == self.approximate_by for k, v, func in active):
+            strata = [v if isinstance(v, list) else [v] for k, v, func in active]
+            df.attrs['dash_express_strata'] = tuple(strata[0]) if strata else None
+        return df
+
+    def _sample(self, df):
+        from .approximate import stratified_positions
+        def build():
+            strata = None if self.approximate_by == None else df[self.approximate_by]
+            sample = df.iloc[stratified_positions(len(df), self.approximate, strata)]
+            sample.attrs = {**df.attrs, 'dash_express_sample': len(df)}
+            return sample
+        return self.derived(df, ('sample', self.approximate, self.approximate_by, self._projection), build)
+
+    @property
+    def _projection(self):
+        # Structures of the whole frame are kept per projection, the ones of a column are shared
+        return None if self.columns == None else tuple(self.columns)
+
+    def _sketches(self, df, col):
+        """Get the sketches of the column per stratum: {stratum: (HyperLogLog, TDigest or None)}"""
+        import pandas as pd
+        from .approximate import HyperLogLog, TDigest
+        def build():
+            numeric = pd.api.types.is_numeric_dtype(df[col].dtype)
+            groups = [(None, df[col])] if self.approximate_by == None else \
+                df.groupby(self.approximate_by, observed=True, sort=False)[col]
+            return {stratum: (HyperLogLog().update(values), TDigest().update(values) if numeric else None)
+                    for stratum, values in groups}
+        return self.derived(df, ('sketches', col, self.approximate_by), build)
+
+    def _stratum_sketches(self, serias):
+        """Get the sketches of the selected strata of the column of an approximate frame or None"""
+        if 'dash_express_strata' not in serias.attrs or serias.name not in self.sketches:
+            return None
+        sketches = self._sketches(self.get_df_func(serias.attrs.get('dash_express_version')), serias.name)
+        strata = serias.attrs['dash_express_strata']
+        return [sketches[s] for s in (sketches if strata == None else strata) if s in sketches]
+
+    def distinct(self, serias):
+        """Count the distinct values of a column of the frame of a render function.
+
+        On an approximate frame which selects whole strata the count is taken from the HyperLogLog sketches 
+        of the strata (about 1.6% error). On other samples (approximate or admission-degraded frames) 
+        it is scaled from the sample with the GEE estimator: the values seen once stand for sqrt(rows / sample rows) values.
+
+        ```python
+        page = Page(app, '/', get_df=get_df, approximate=100_000, approximate_by='region', sketches=['customer'])
+        page.add_kpi(FastKPI('customer', agg_func=page.distinct, pretty_func=str))
+        ```"""
+        from .approximate import HyperLogLog, distinct_estimate
+        sketches = self._stratum_sketches(serias)
+        if sketches == None:
+            return distinct_estimate(serias)
+        merged = HyperLogLog()
+        for hll, digest in sketches:
+            merged = merged.merge(hll)
+        return merged.count()
+
+    def quantile(self, serias, q=0.5):
+        """Get the quantile of a numeric column of the frame of a render function.
+
+        On an approximate frame which selects whole strata it is taken from the t-digest sketches 
+        of the strata, on other frames it is computed on the rows"""
+        from .approximate import TDigest
+        sketches = self._stratum_sketches(serias)
+        if sketches == None or any(digest == None for hll, digest in sketches):
+            return serias.quantile(q)
+        merged = TDigest()
+        for hll, digest in sketches:
+            merged = merged.merge(digest)
+        return merged.quantile(q)
+
+    def estimate(self, filters, version=None):
+        """Estimate the rows left by the filters and the size of a row in bytes: (rows, row bytes).
+
+        The shares of rows left by the filters are taken from their statistics and multiplied, 
+        a cached filtered frame is counted exactly"""
+        version = version or self.data_version()
+        df = self.get_df_func(version)
+        row_bytes = self.derived(df, ('row_bytes', self._projection), lambda: _frame_size((version, df)) / max(len(df), 1))
+        cached = self.FRAMES.get(self.state_key(filters, version))
+        if cached is not None:
+            return len(cached), row_bytes
+        share = 1.0
+        for k, v, func in self._active(filters):
+            share *= self._selectivity(df, k, v, func)
+        return int(len(df) * share), row_bytes
+
+    @contextmanager
+    def admit(self, filters, version=None, copies=2, degrade=True):
+        """Reserve the estimated memory of a request over the filtered rows, see DashExpress memory_budget.
+
+        Yields the number of rows the request may use, None for all rows. 
+        Raises PreventUpdate if the request is rejected.
+
+        :param copies: how many copies of the filtered rows the request holds at once
+        :param degrade: the request may run on a sample of the rows"""
+        admission = self.app.admission
+        if not admission.enabled(self.max_concurrent, self.memory_budget):
+            yield None
+            return
+        rows, row_bytes = self.estimate(filters, version)
+        cost = int(rows * row_bytes * copies)
+        with admission.admit(self.URL, cost, self.app._session(), self.max_concurrent, 
+                             self.memory_budget, degrade) as granted:
+            if not granted:
+                self.app.logger.warning('%s: request rejected, estimated %d rows', self, rows)
+                raise PreventUpdate
+            if granted >= cost:
+                yield None
+            else:
+                max_rows = max(int(granted // (row_bytes * copies)), 1)
+                self.app.logger.info('%s: estimated %d rows, sampled to %d', self, rows, max_rows)
+                yield max_rows
+
+    def warm(self, df=None):
+        """Build the indexes and statistics of the filters, the sample and the sketches for the loaded DataFrame"""
+        df = self.get_df_func() if df is None else df
+        for k, func in self.FILTERS_FUNC.items():
+            for cls in {getattr(func, 'index', None), getattr(func, 'stats', None)} - {None}:
+                self._filter_stats(df, k, cls)
+        if self.approximate:
+            self._sample(df)
+            for col in self.sketches:
+                self._sketches(df, col)
+
+    def _selectivity(self, df, k, v, func):
+        """Estimate the share of rows left by the filter, 1 if the filter has no statistics"""
+        if not hasattr(func, 'stats'):
+            return 1.0
+        return func.selectivity(self._filter_stats(df, k, func.stats), v)
+
+    def _filter_stats(self, df, k, cls):
+        """Get the index or statistics of the filter column, built once per data version"""
+        update = lambda value, offset: value.append(df[k].iloc[offset:], offset)
+        return self.derived(df, (cls.__name__, k), lambda: cls(df[k]), 
+                            update if hasattr(cls, 'append') else None)
+
+    def derived(self, df, key, build, update=None):
+        """Get a structure derived from the loaded DataFrame (e.g. filter index), 
+        it is shared by the pages of the source, see DataSource.derived"""
+        return self.source.derived(df, key, build, update)
+
     @staticmethod
     def render_wrapper():
+        from .preview_chart import _render_wrapper
         return _render_wrapper()
 
     @staticmethod
@@ -871,3 +1861,11 @@ class Page(object):
                     ]
                 )
             ])
+
+
+def __getattr__(name):
+    # The KPI classes are imported on first use
+    if name in ('KPI', 'FastKPI'):
+        from . import kpi
+        return getattr(kpi, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
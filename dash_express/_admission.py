@@ -0,0 +1,108 @@
+import time
+import threading
+
+from contextlib import contextmanager
+
+
+DECISIONS = ('admitted', 'queued', 'degraded', 'rejected')
+
+
+class Admission(object):
+    """Concurrency and memory limits of the heavy callbacks (renders, downloads) of a process.
+
+    The cost of a request is estimated before it runs. The request waits until its page runs
+    less than `limit` requests and the cost fits the free memory of the process, of the session
+    and of the page. A request that can not get its cost even alone or after waiting `timeout`
+    seconds is degraded to the memory it can get, if it can not be degraded it is rejected.
+
+    :param memory_budget: bytes for the concurrent requests of the process, None - unlimited
+    :param session_budget: bytes for the concurrent requests of one session, None - unlimited
+    :param timeout: seconds a request waits in the queue"""
+    def __init__(self, memory_budget=None, session_budget=None, timeout=10):
+        self.memory_budget = memory_budget
+        self.session_budget = session_budget
+        self.timeout = timeout
+        self.used = 0
+        self.peak = 0
+        self._sessions = {}
+        self._running = {}
+        self._pages = {}
+        self._cond = threading.Condition()
+
+    def enabled(self, limit=None, page_budget=None):
+        return not (self.memory_budget == None and self.session_budget == None
+                    and limit == None and page_budget == None)
+
+    def _free(self, session, page_budget):
+        free = [budget for budget in (page_budget,) if budget != None]
+        if self.memory_budget != None:
+            free.append(self.memory_budget - self.used)
+        if self.session_budget != None:
+            free.append(self.session_budget - self._sessions.get(session, 0))
+        return min(free) if free else float('inf')
+
+    def _count(self, page, decision, wait=0):
+        stats = self._pages.setdefault(page, {**dict.fromkeys(DECISIONS, 0), 'wait_seconds': 0.0})
+        stats[decision] += 1
+        stats['wait_seconds'] += wait
+
+    @contextmanager
+    def admit(self, page, cost, session=None, limit=None, page_budget=None, degrade=True):
+        """Reserve the memory of a request for the duration of the block.
+
+        Yields the granted bytes: the cost if the request is admitted, less if it is degraded,
+        0 if it is rejected (nothing is reserved)
+
+        :param page: page url, the metrics are kept per page
+        :param cost: estimated bytes
+        :param session: identity of the session
+        :param limit: concurrent requests of the page
+        :param page_budget: bytes for one request of the page
+        :param degrade: the request can run with less memory than the cost"""
+        cost = max(int(cost), 1)
+        budgets = [budget for budget in (self.memory_budget, self.session_budget, page_budget) if budget != None]
+        # A request above a budget can get at most the whole budget
+        want = min([cost] + budgets)
+        slot = lambda: self._running.get(page, 0) < (limit or float('inf'))
+        ready = lambda: slot() and self._free(session, page_budget) >= want
+        start = time.monotonic()
+        with self._cond:
+            queued = not ready()
+            if queued and (degrade or want == cost):
+                self._cond.wait_for(ready, self.timeout)
+            if ready():
+                granted = want
+            elif degrade and slot():
+                granted = max(self._free(session, page_budget), 0)
+            else:
+                granted = 0
+            if granted < cost and not degrade:
+                granted = 0
+            decision = ('rejected' if not granted else 'degraded' if granted < cost 
+                        else 'queued' if queued else 'admitted')
+            self._count(page, decision, time.monotonic() - start)
+            if granted:
+                self.used += granted
+                self.peak = max(self.peak, self.used)
+                self._sessions[session] = self._sessions.get(session, 0) + granted
+                self._running[page] = self._running.get(page, 0) + 1
+        if not granted:
+            yield 0
+            return
+        try:
+            yield granted
+        finally:
+            with self._cond:
+                self.used -= granted
+                self._sessions[session] -= granted
+                if self._sessions[session] <= 0:
+                    del self._sessions[session]
+                self._running[page] -= 1
+                self._cond.notify_all()
+
+    def metrics(self):
+        """Get the decisions per page and the memory in use: {'memory_used', 'memory_peak', 'pages': {...}}"""
+        with self._cond:
+            pages = {page: {**stats, 'running': self._running.get(page, 0)} for page, stats in self._pages.items()}
+            return {'memory_budget': self.memory_budget, 'session_budget': self.session_budget,
+                    'memory_used': self.used, 'memory_peak': self.peak, 'sessions': len(self._sessions), 'pages': pages}
@@ -0,0 +1,60 @@
+import os
+import asyncio
+import inspect
+import threading
+
+
+_loop = None
+_pid = None
+_lock = threading.Lock()
+
+
+def get_loop():
+    """Get the event loop shared by all callbacks, it runs in a daemon thread"""
+    global _loop, _pid
+    with _lock:
+        # The loop thread does not survive a fork of the worker process
+        if _loop == None or _pid != os.getpid():
+            _loop, _pid = asyncio.new_event_loop(), os.getpid()
+            threading.Thread(target=_loop.run_forever, name='dash-express-aio', daemon=True).start()
+    return _loop
+
+
+def run(coro):
+    """Run a coroutine on the shared event loop and wait for the result"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
+
+
+def call(func, *args, **kwargs):
+    """Call a regular or an async function and get the result"""
+    result = func(*args, **kwargs)
+    if inspect.isawaitable(result):
+        return run(result)
+    return result
+
+
+async def _gather(values, limit, on_done):
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(value):
+        async with semaphore:
+            try:
+                return await value
+            finally:
+                on_done()
+
+    return await asyncio.gather(*(bounded(v) for v in values), return_exceptions=True)
+
+
+def resolve(values, limit=10, on_done=lambda: None):
+    """Await all awaitable values concurrently, at most limit at a time.
+
+    Exceptions raised by the awaitables are returned in place of the results."""
+    pending = [i for i, v in enumerate(values) if inspect.isawaitable(v)]
+    if not pending:
+        return values
+    results = run(_gather([values[i] for i in pending], limit, on_done))
+    values = list(values)
+    for i, result in zip(pending, results):
+        values[i] = result
+    return values
@@ -1,4 +1,3 @@
-import plotly.io as pio
 import dash_mantine_components as dmc
 
 from dash_iconify import DashIconify
@@ -7,15 +6,22 @@ from dash import html, dcc, Output, Input, State, ALL
 
 m = 15
 margin = dict(l=m, r=m, t=round(3.5*m), b=m)
-DARK_PLOTLY_TEMPLATES = pio.templates["plotly_dark"]
-DARK_PLOTLY_TEMPLATES['layout']['paper_bgcolor'] = 'rgba(0,0,0,0)'
-DARK_PLOTLY_TEMPLATES['layout']['plot_bgcolor'] = 'rgba(0,0,0,0)'
-DARK_PLOTLY_TEMPLATES['layout']['margin'] = margin
 
-LIGHT_PLOTLY_TEMPLATES = pio.templates["plotly_white"]
-LIGHT_PLOTLY_TEMPLATES['layout']['paper_bgcolor'] = 'rgba(0,0,0,0)'
-LIGHT_PLOTLY_TEMPLATES['layout']['plot_bgcolor'] = 'rgba(0,0,0,0)'
-LIGHT_PLOTLY_TEMPLATES['layout']['margin'] = margin
+
+def plotly_template(name, colorway=None):
+    """Get a copy of the plotly template with a transparent background, the global template is not changed
+
+    :param name: name of the template in plotly.io.templates or a template object"""
+    import plotly.io as pio
+    import plotly.graph_objects as go
+    template = go.layout.Template(pio.templates[name] if isinstance(name, str) else name)
+    template.layout.paper_bgcolor = 'rgba(0,0,0,0)'
+    template.layout.plot_bgcolor = 'rgba(0,0,0,0)'
+    template.layout.margin = margin
+    if colorway != None:
+        template.layout.colorway = colorway
+    return template
+
 
 class AppShell(object):
     def __init__(self, 
@@ -33,14 +39,18 @@ class AppShell(object):
         self.THEME = theme or {}
         self.THEME["primaryColor"] = self.PRIMARY_COLORS
         self.DEFAULT_THEME = default_colorscheme
+        self.PROGRESS_STYLE = {'position': 'fixed', 'top': 0, 'left': 0, 'right': 0, 'zIndex': 1000}
         self.NAV_BUTTON_KWARGS = dict(color='primary',
                                 p=3, miw=50, variant='subtle')
         self.THEME_ICON = {'dark': theme_icon_dark,"light": theme_icon_light}
         self.THEME_ICON_COLOR = {'dark': "gray",
                             "light": "yellow"}
         
-        self.LIGHT_PLOTLY_TEMPLATES = light_plotly_templates or LIGHT_PLOTLY_TEMPLATES
-        self.DARK_PLOTLY_TEMPLATES = dark_plotly_templates or DARK_PLOTLY_TEMPLATES
+        # The templates are built on first use, plotly templates take a while to load
+        self._templates = {'light': light_plotly_templates or 'plotly_white', 
+                           'dark': dark_plotly_templates or 'plotly_dark'}
+        self._built_templates = {}
+        self.COLORWAY = None
         self.DARK_LEAFLET_TILE = dark_leaflet_tile or 'https://tiles.stadiamaps.com/tiles/alidade_smooth_dark/{z}/{x}/{y}{r}.png'
         self.LIGHT_LEAFLET_TILE = light_leaflet_tile or 'https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png'
 
@@ -53,9 +63,31 @@ class AppShell(object):
         primarycolors = self.PRIMARY_COLORS
         lst = [[k, v[-1]] for k, v in dmc.theme.DEFAULT_COLORS.items()]
         colorway = list(sorted(lst, key = lambda x: '#zzzz' if (x[0] == primarycolors) else x[1], reverse=True))
-        colorway = [i[1].upper() for i in colorway][:10]
-        self.LIGHT_PLOTLY_TEMPLATES['layout']['colorway'] = colorway
-        self.DARK_PLOTLY_TEMPLATES['layout']['colorway']  = colorway
+        self.COLORWAY = [i[1].upper() for i in colorway][:10]
+        self._built_templates = {}
+
+    def _template(self, scheme):
+        if scheme not in self._built_templates:
+            self._built_templates[scheme] = plotly_template(self._templates[scheme], self.COLORWAY)
+        return self._built_templates[scheme]
+
+    @property
+    def LIGHT_PLOTLY_TEMPLATES(self):
+        return self._template('light')
+
+    @LIGHT_PLOTLY_TEMPLATES.setter
+    def LIGHT_PLOTLY_TEMPLATES(self, template):
+        self._templates['light'] = template
+        self._built_templates.pop('light', None)
+
+    @property
+    def DARK_PLOTLY_TEMPLATES(self):
+        return self._template('dark')
+
+    @DARK_PLOTLY_TEMPLATES.setter
+    def DARK_PLOTLY_TEMPLATES(self, template):
+        self._templates['dark'] = template
+        self._built_templates.pop('dark', None)
 
     def build_nav_name(self, name, access):
         """Get the name of the navigation button"""
@@ -219,7 +251,10 @@ class AppShell(object):
                     dcc.Store(id="filter-store", storage_type="local"),
                     dcc.Store(id="page-store"),
                     dcc.Store(id='contentfilter-store'),
+                    dcc.Store(id='filter-version-store'),
+                    dcc.Store(id='crossfilter-store', data={}),
                     dcc.Location(id='url-store'),
+                    self.progress_bar(app),
                     self.render(app)
                 ]
             ),
@@ -229,10 +264,18 @@ class AppShell(object):
             withNormalizeCSS=True,
         )
     
+    def progress_bar(self, app):
+        """Get the page render progress bar, shown only for background rendering"""
+        if not app.background:
+            return html.Div()
+        return dmc.Progress(id='render-progress', value=0, size='xs', radius=0,
+                            style={**self.PROGRESS_STYLE, 'display': 'none'})
+
     def base_clientside(self, app):
         """Basic callback functions on the client side"""
         # Theme addition
-        app.clientside_callback(
+        app.clientside_function(
+            'theme_icon',
             """ function(data) {  
                 const icon = data["colorScheme"] == "dark" ? "%(dark_icon)s" : "%(light_icon)s";
                 const color = data["colorScheme"] != "dark" ? "%(dark_color)s" : "%(light_color)s";
@@ -249,7 +292,8 @@ class AppShell(object):
             Input("theme-store", "data"),
         )
         # Nav-link variant
-        app.clientside_callback(
+        app.clientside_function(
+            'nav_link_variant',
             """ function(url, href) { 
                 const res = [];  
                 const res2 = []        
@@ -436,13 +480,15 @@ class BaseAppShell(AppShell):
     def app_shell_clientside(self, app):
         """Add additional callbacks on the client side"""
         # Hide filters
-        app.clientside_callback(
+        app.clientside_function(
+            'hide_filters',
             """ function(data) {  return data["display"]  } """,
             Output("grid-provider", "display"),
             Input("filter-wrapper-store", "data"),
         )
-        app.clientside_callback(
-            """function(n_clicks, sn_clicks1, data) {
+        app.clientside_function(
+            'toggle_filters',
+            """function(n_clicks, n_clicks1, data) {
                 if (data) {
                     if (n_clicks || n_clicks1) {
                         const colsnum = data["display"] == "block" ? "none" : "block"
@@ -508,7 +554,8 @@ class AsideAppShell(BaseAppShell):
     
     def app_shell_clientside(self, app):
        # Hide filters
-        app.clientside_callback(
+        app.clientside_function(
+            'toggle_drawer',
             """ function(n,n2, opened) {  
                 if (n || n2) {return opened != true } 
                 return dash_clientside.no_update} """,
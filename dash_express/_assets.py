@@ -0,0 +1,61 @@
+import re
+import hashlib
+
+import flask
+
+
+def minify(source):
+    """Drop indentation, blank lines and line comments from a JavaScript source"""
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+class ClientBundle(object):
+    """JavaScript generated by the app and served as one script.
+
+    The file name contains a hash of the content, so the browser can cache
+    the script forever and a new version is downloaded only after it changes.
+    Clientside callback functions are published in ``dash_clientside.dash_express``
+    and referenced with ``ClientsideFunction``."""
+    URL_PATH = '_dash-express/'
+    NAMESPACE = 'dash_express'
+
+    def __init__(self):
+        self.PARTS = {}
+        self.FUNCTIONS = {}
+        self.filename = None
+        self.content = b''
+
+    def add(self, name, source):
+        """Add or replace a named part of the bundle"""
+        self.PARTS[name] = source
+
+    def add_function(self, name, source):
+        """Add or replace a clientside callback function"""
+        if not re.match(r'^[A-Za-z_$][\w$]*$', name):
+            raise ValueError(f"invalid clientside function name: {name}")
+        self.FUNCTIONS[name] = source.strip()
+
+    def build(self):
+        """Join the parts and compute the versioned file name"""
+        functions = ',\n'.join(f'{name}: {source}' for name, source in self.FUNCTIONS.items())
+        namespace = ('window.dash_clientside = window.dash_clientside || {};\n'
+                     'window.dash_clientside.%s = {\n%s\n};' % (self.NAMESPACE, functions))
+        self.content = minify('\n'.join(list(self.PARTS.values()) + [namespace])).encode('utf-8')
+        digest = hashlib.sha1(self.content).hexdigest()[:12]
+        self.filename = f'bundle.{digest}.js'
+        return self.filename
+
+    def src(self, app):
+        """Get the url of the current bundle"""
+        return app.config.requests_pathname_prefix + self.URL_PATH + self.filename
+
+    def serve(self, filename):
+        """Flask view for the bundle"""
+        if filename != self.filename:
+            flask.abort(404)
+        response = flask.Response(self.content, mimetype='application/javascript')
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000  # 1 year
+        response.cache_control.immutable = True
+        return response
@@ -0,0 +1,68 @@
+import gzip
+
+from flask import request, g
+
+from ._lru import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE = {'application/json', 'text/html', 'application/javascript', 'text/css', 'text/plain'}
+
+
+class ResponseLayer(object):
+    """Compression and validators for the responses of the app.
+
+    Responses above the threshold are compressed with brotli (if installed) or gzip.
+    GET responses (index, layout, dependencies, scripts) get an ETag and are answered
+    with 304 when the client already has them, their compressed bodies are cached.
+    Browsers do not revalidate POST requests, callbacks with a deterministic result 
+    set g.dash_express_body_key to cache their compressed bodies without an ETag."""
+    def __init__(self, threshold=1024, level=6):
+        self.threshold = threshold
+        self.level = level
+        self.COMPRESSED = LRUCache(64)
+
+    def init_app(self, server):
+        server.after_request(self.after_request)
+
+    def encoding(self):
+        accept = request.accept_encodings
+        if brotli != None and accept['br']:
+            return 'br'
+        if accept['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=min(self.level, 11))
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def after_request(self, response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or response.mimetype not in COMPRESSIBLE or 'Content-Encoding' in response.headers):
+            return response
+        if request.method == 'GET':
+            response.add_etag(weak=True)
+            response.make_conditional(request)
+            if response.status_code != 200:
+                return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.encoding()
+        data = response.get_data()
+        if encoding == None or len(data) < self.threshold:
+            return response
+        tag = response.get_etag()[0] if request.method == 'GET' else g.get('dash_express_body_key')
+        body = self.COMPRESSED.get((tag, encoding)) if tag else None
+        if body == None:
+            body = self.compress(data, encoding)
+            if tag:
+                self.COMPRESSED.set((tag, encoding), body)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
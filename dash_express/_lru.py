@@ -0,0 +1,70 @@
+import threading
+
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """Thread-safe in-process LRU cache bounded by the number of items 
+    and, if sizeof is given, by the total size of the values
+
+    :param maxsize: the maximum number of items, 0 disables the cache
+    :param maxbytes: the maximum total size of the values
+    :param sizeof: function returning the size of a value in bytes"""
+    def __init__(self, maxsize=8, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return value
+        size = self.sizeof(value) if self.sizeof != None else 0
+        if self.maxbytes != None and size > self.maxbytes:
+            self.pop(key)
+            return value
+        with self._lock:
+            self.nbytes += size - self._sizes.get(key, 0)
+            self._items[key] = value
+            self._sizes[key] = size
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize or (self.maxbytes != None and self.nbytes > self.maxbytes):
+                old, _ = self._items.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self.nbytes -= self._sizes.pop(key)
+            return self._items.pop(key)
+
+    def setdefault(self, key, value):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        return self.set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.nbytes = 0
@@ -0,0 +1,156 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+
+from contextlib import contextmanager
+from flask_caching.backends import SimpleCache, NullCache, FileSystemCache
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Run one computation per key at a time across threads and worker processes.
+
+    Threads of a process wait on a local lock. Workers wait on a lock that depends
+    on the cache backend: an flock file for FileSystemCache, an atomic cache.add
+    for shared backends (Redis, Memcached, ...), nothing more for SimpleCache which
+    is process local anyway.
+
+    :param cache: flask_caching.Cache of the app
+    :param lock_timeout: seconds after which the lock of a crashed worker is released (cache.add locks)
+    :param poll: seconds between attempts to take a cache.add lock"""
+    def __init__(self, cache, lock_timeout=300, poll=0.05):
+        self.cache = cache
+        self.lock_timeout = lock_timeout
+        self.poll = poll
+        self._locks = {}
+        self._calls = {}
+        self._guard = threading.Lock()
+
+    @property
+    def mode(self):
+        backend = self.cache.cache
+        if isinstance(backend, (SimpleCache, NullCache)):
+            return 'local'
+        if isinstance(backend, FileSystemCache) and fcntl != None:
+            return 'file'
+        return 'add'
+
+    def get_or_compute(self, key, compute, timeout=None, serializer=None):
+        """Get the value of the key from the cache or compute and cache it.
+
+        Only one caller computes a missing value, the others wait and read it from the cache.
+        The serializer (see dash_express.serializers) stores the value in the cache, 
+        by default the cache backend pickles it"""
+        get = serializer.get if serializer != None else lambda cache, key: cache.get(key)
+        value = get(self.cache, key)
+        if value is not None:
+            return value
+        with self.lock(key):
+            value = get(self.cache, key)
+            if value is None:
+                value = compute()
+                if serializer != None:
+                    serializer.set(self.cache, key, value, timeout=timeout)
+                else:
+                    self.cache.set(key, value, timeout=timeout)
+        return value
+
+    def share(self, key, compute):
+        """Run compute once for the concurrent callers with the same key in this process.
+
+        The first caller computes, the others wait and get its result (or exception)"""
+        with self._guard:
+            call = self._calls.get(key)
+            leader = call == None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.value = compute()
+            except BaseException as error:
+                call.error = error
+            finally:
+                with self._guard:
+                    del self._calls[key]
+                call.done.set()
+        if call.error != None:
+            raise call.error
+        return call.value
+
+    @contextmanager
+    def lock(self, key):
+        with self._local_lock(key):
+            mode = self.mode
+            if mode == 'file':
+                with self._file_lock(key):
+                    yield
+            elif mode == 'add':
+                with self._add_lock(key):
+                    yield
+            else:
+                yield
+
+    @contextmanager
+    def _local_lock(self, key):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    @contextmanager
+    def _file_lock(self, key):
+        # One lock file per key, so nested computations of other keys never wait for each other.
+        # The holder removes the file, a waiter which locked a removed file tries again
+        folder = os.path.join(tempfile.gettempdir(), 'dash_express_locks')
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, hashlib.sha1(key.encode()).hexdigest() + '.lock')
+        while True:
+            file = open(path, 'a')
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                if os.fstat(file.fileno()).st_ino == os.stat(path).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            file.close()
+        try:
+            yield
+        finally:
+            os.unlink(path)
+            file.close()
+
+    @contextmanager
+    def _add_lock(self, key):
+        lock_key = key + '/lock'
+        deadline = time.monotonic() + self.lock_timeout
+        acquired = self.cache.add(lock_key, 1, timeout=self.lock_timeout)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(self.poll)
+            acquired = self.cache.add(lock_key, 1, timeout=self.lock_timeout)
+        try:
+            yield
+        finally:
+            if acquired:
+                self.cache.delete(lock_key)
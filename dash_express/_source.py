@@ -0,0 +1,181 @@
+import time
+
+from flask import g, has_request_context
+
+from . import _aio
+
+
+class DataSource(object):
+    """The DataFrame of one or several pages: loading, data versions and derived structures.
+
+    The DataFrame is cached per data version (see DataSource.data_version) in the app cache
+    and in the process memory (local_cache_bytes), it is loaded by one thread or worker
+    at a time, see DashExpress.single_flight.
+    With optimize=True the column types of the loaded DataFrame are compacted
+    and the saved memory is reported to the app logger and DataSource.frame_report,
+    a dict of optimize_frame parameters can be passed instead, e.g. optimize=dict(downcast=True)
+
+    For data that only grows pass get_new_rows(since): a new version appends its rows
+    to the DataFrame of the previous version instead of calling get_df, since is
+    the maximum of the append_key column or, without append_key, the number of rows.
+
+    :param app: DashExpress app
+    :param key: prefix of the cache keys, e.g. 'Source: sales'
+    :param get_df: function returning the DataFrame, may be declared with `async def`"""
+    def __init__(self, app, key, get_df, optimize=False, get_new_rows=None, append_key=None):
+        self.app = app
+        self.key = key
+        self.get_df = get_df
+        self.optimize = optimize
+        self.get_new_rows = get_new_rows
+        self.append_key = append_key
+        self.frame_report = None
+        self.DERIVED = {}
+        self.VIEWS = {}
+        self._oversized = False
+        self._preloaded = False
+
+    def __repr__(self):
+        return self.key
+
+    def frame(self, version=None):
+        """Get the DataFrame of the data version (the current one by default)"""
+        version = version or self.data_version()
+        # The local tier holds the DataFrame of the current version only
+        local = self._local()
+        if local != None and local[0] == version:
+            return local[1]
+        # Only one thread or worker runs get_df for a version, the others wait for its result
+        df = self.app.single_flight.get_or_compute(f'{self}/data/{version}', lambda: self._load(version),
+                                                   timeout=self.app.default_cache_timeout,
+                                                   serializer=self.app.frame_serializer)
+        df.attrs['dash_express_version'] = version
+        self.app.PINNED_FRAMES.pop(self.key, None)
+        self.app.LOCAL_FRAMES.set(self.key, (version, df))
+        if self.app.LOCAL_FRAMES.maxsize and self.key not in self.app.LOCAL_FRAMES and not self._oversized:
+            self._oversized = True
+            self.app.logger.warning('%s: the DataFrame is larger than local_cache_bytes, it is read '
+                                    'from the app cache on every request', self)
+        return df
+
+    def _local(self):
+        pinned = self.app.PINNED_FRAMES.get(self.key)
+        return pinned if pinned != None else self.app.LOCAL_FRAMES.get(self.key)
+
+    def pin(self, df):
+        """Keep the loaded DataFrame in the process memory until the data version changes,
+        regardless of local_cache_bytes (see DashExpress.preload).
+        The data version no longer expires, it changes on invalidate only: the workers 
+        forked after preload would otherwise load their own copies of the DataFrame"""
+        version = df.attrs['dash_express_version']
+        self._preloaded = True
+        self.app.cache.set(f'{self}/version', version, timeout=0)
+        self.app.PINNED_FRAMES[self.key] = (version, df)
+        self.app.LOCAL_FRAMES.pop(self.key)
+
+    def _load(self, version):
+        from .optimize import optimize_frame
+        df = self._append() if self.get_new_rows != None else None
+        if df is None:
+            df = _aio.call(self.get_df)
+            if self.optimize:
+                options = self.optimize if isinstance(self.optimize, dict) else {}
+                df, self.frame_report = optimize_frame(df, **options)
+                self.app.logger.info('%s: DataFrame optimized, %.1f MB -> %.1f MB', self,
+                                     self.frame_report['before'] / 2**20, self.frame_report['after'] / 2**20)
+        # Derived structures are rebuilt (or updated after an append) for a new version
+        df.attrs['dash_express_version'] = version
+        if self.get_new_rows != None:
+            self.app.cache.set(f'{self}/data/last', version, timeout=0)
+        return df
+
+    def _append(self):
+        """Get the DataFrame of the previous version with the new rows, None if it is not cached"""
+        from .optimize import append_frame
+        last = self.app.cache.get(f'{self}/data/last')
+        if last == None:
+            return None
+        local = self._local()
+        if local != None and local[0] == last:
+            df = local[1]
+        else:
+            df = self.app.frame_serializer.get(self.app.cache, f'{self}/data/{last}')
+        if df is None:
+            return None
+        since = df[self.append_key].max() if self.append_key != None else len(df)
+        rows = _aio.call(self.get_new_rows, since)
+        self.app.logger.info('%s: %d new rows appended', self, 0 if rows is None else len(rows))
+        appended = append_frame(df, rows)
+        appended.attrs['dash_express_base'] = (last, len(df))
+        return appended
+
+    def data_version(self):
+        """Get the data version.
+
+        The version is a monotonic number shared through the app cache. The DataFrame and
+        everything derived from it (filtered frames, render results, downloads) are keyed
+        by the version. It changes on invalidate and when it expires after default_cache_timeout,
+        the version of a preloaded source does not expire (see DataSource.pin).
+        It is read from the app cache once per request"""
+        if not has_request_context():
+            return self._read_version()
+        versions = g.setdefault('dash_express_versions', {})
+        if self.key not in versions:
+            versions[self.key] = self._read_version()
+        return versions[self.key]
+
+    def _read_version(self):
+        return self.app.single_flight.get_or_compute(f'{self}/version', time.time_ns,
+                                                     timeout=self._version_timeout())
+
+    def _version_timeout(self):
+        return 0 if self._preloaded else self.app.default_cache_timeout
+
+    def invalidate(self, full=False):
+        """Bump the data version, the data is loaded again on the next request.
+
+        With get_new_rows the new rows are appended, full=True calls get_df instead.
+
+        Returns the new version"""
+        if full:
+            self.app.cache.delete(f'{self}/data/last')
+        version = max((self.app.cache.get(f'{self}/version') or 0) + 1, time.time_ns())
+        self.app.cache.set(f'{self}/version', version, timeout=self._version_timeout())
+        if has_request_context():
+            g.setdefault('dash_express_versions', {})[self.key] = version
+        return version
+
+    def view(self, df, columns):
+        """Get the projection of the DataFrame to the columns, the data is not copied.
+
+        The view is kept while df is the loaded frame, e.g. until it is replaced by the frozen one"""
+        columns = tuple(columns)
+        cached = self.VIEWS.get(columns)
+        if cached == None or cached[0] is not df:
+            cached = self.VIEWS[columns] = (df, project(df, columns))
+        return cached[1]
+
+    def derived(self, df, key, build, update=None):
+        """Get a structure derived from the loaded DataFrame (e.g. filter index).
+
+        It is built once per data version and kept in the process memory, the pages
+        of the source share it. If the rows of the version were appended to the previous one,
+        update(value, offset) gets the structure of the previous version and the offset of the new rows"""
+        version = df.attrs.get('dash_express_version')
+        cached = self.DERIVED.get(key)
+        if cached == None or cached[0] != version:
+            base = df.attrs.get('dash_express_base')
+            if update != None and cached != None and base != None and cached[0] == base[0]:
+                value = update(cached[1], base[1])
+            else:
+                value = build()
+            cached = self.DERIVED[key] = (version, value)
+        return cached[1]
+
+
+def project(df, columns):
+    """Get a DataFrame with the columns of df, their data is not copied"""
+    import pandas as pd
+    view = pd.DataFrame({col: df[col] for col in columns}, copy=False)
+    view.attrs = dict(df.attrs)
+    return view
@@ -0,0 +1,23 @@
+import json
+import hashlib
+
+
+def filters_hash(filters):
+    """Get the short stable hash (BLAKE2b) of the canonical JSON of the filter values"""
+    string = json.dumps(filters, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(string.encode(), digest_size=8).hexdigest()
+
+
+def filter_values(state):
+    """Get the filter values from the contentfilter-store data: {'filters': {...}, 'cross': {...}}"""
+    return (state or {}).get('filters') or {}
+
+
+def cross_values(state):
+    """Get the chart selections from the contentfilter-store data: {graph id: [values]}"""
+    return (state or {}).get('cross') or {}
+
+
+def cross_origin(state):
+    """Get the graph whose selection alone changed the contentfilter-store data, None otherwise"""
+    return (state or {}).get('origin')
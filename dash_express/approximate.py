@@ -0,0 +1,145 @@
+"""Samples and sketches of the approximate mode of a page, see Page approximate.
+
+Render functions get a sample of the filtered rows, the sums and counts computed on it
+are scaled to all rows with `scale`:
+
+```python
+from dash_express.approximate import scale
+
+def revenue(df):
+    pv = df.groupby('region', observed=True)['revenue'].sum() * scale(df)
+    return go.Figure([go.Bar(x=pv.index, y=pv)])
+```
+"""
+import numpy as np
+import pandas as pd
+
+
+def scale(df):
+    """Get the ratio of the rows of the exact result to the rows of the frame, 1 if the frame is not a sample"""
+    return df.attrs.get('dash_express_sample', len(df)) / max(len(df), 1)
+
+
+def _bit_length(values):
+    # frexp is exact for integers below 2**53, the hash is split into 32-bit halves
+    high, low = (values >> np.uint64(32)).astype(np.float64), (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+def distinct_estimate(serias):
+    """Estimate the distinct values of the rows a sample stands for (GEE estimator),
+    the count of the values if the series is not a sample.
+
+    The values seen once in the sample stand for sqrt(rows / sample rows) values each, the error 
+    ratio is at most sqrt(rows / sample rows)"""
+    total = serias.attrs.get('dash_express_sample', len(serias))
+    if total <= len(serias):
+        return serias.nunique()
+    counts = serias.value_counts()
+    once = int((counts == 1).sum())
+    return min(int(round(np.sqrt(total / len(serias)) * once + len(counts) - once)), int(total))
+
+
+class HyperLogLog(object):
+    """Distinct count sketch, the relative error is about 1.04 / sqrt(2 ** p)
+
+    :param p: 2 ** p registers of one byte"""
+    def __init__(self, p=12):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update(self, values):
+        values = pd.Series(values)
+        hashes = pd.util.hash_pandas_object(values[values.notna()], index=False).to_numpy()
+        if len(hashes) == 0:
+            return self
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p + 1 - _bit_length(rest)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        merged = HyperLogLog(self.p)
+        merged.registers = np.maximum(self.registers, other.registers)
+        return merged
+
+    def count(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class TDigest(object):
+    """Quantile sketch: weighted centroids, small near the tails (merging t-digest with the k1 scale)
+
+    :param compression: at most compression centroids are kept"""
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+        keep = ~np.isnan(values)
+        values, weights = values[keep], weights[keep]
+        if len(values) == 0:
+            return self
+        self.min, self.max = min(self.min, values.min()), max(self.max, values.max())
+        self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, weights]))
+        return self
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / cumulative[-1]
+        # Centroids with the same integer part of k(q) are merged
+        k = np.floor(self.compression / np.pi * (np.arcsin(2 * q - 1) + np.pi / 2)).astype(np.intp)
+        _, groups = np.unique(k, return_inverse=True)
+        self.weights = np.bincount(groups, weights)
+        self.means = np.bincount(groups, weights * means) / self.weights
+
+    def merge(self, other):
+        merged = TDigest(self.compression)
+        merged.min, merged.max = min(self.min, other.min), max(self.max, other.max)
+        if len(self.means) + len(other.means):
+            merged._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+        return merged
+
+    def quantile(self, q):
+        if len(self.means) == 0:
+            return np.nan
+        cumulative = np.cumsum(self.weights)
+        positions = (cumulative - self.weights / 2) / cumulative[-1]
+        return float(np.interp(q, np.concatenate([[0], positions, [1]]),
+                               np.concatenate([[self.min], self.means, [self.max]])))
+
+
+def stratified_positions(total, size, strata=None, minimum=10, seed=0):
+    """Get the sorted positions of a stratified sample of about size rows.
+
+    Every stratum gets a share of the sample proportional to its rows, but at least minimum rows
+    (or all of its rows), so the small groups stay in the charts
+
+    :param total: rows of the frame
+    :param size: rows of the sample
+    :param strata: the column of the strata, None for a uniform sample"""
+    rng = np.random.default_rng(seed)
+    if total <= size:
+        return np.arange(total)
+    if strata is None:
+        return np.sort(rng.choice(total, size, replace=False))
+    codes = pd.factorize(strata, use_na_sentinel=False)[0]
+    counts = np.bincount(codes)
+    share = np.maximum(np.round(counts * size / total), np.minimum(counts, minimum)).astype(np.intp)
+    # A random order within every stratum, the first rows of the stratum are taken
+    order = np.lexsort((rng.random(total), codes))
+    rank = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.sort(order[rank < np.repeat(share, counts)])
@@ -57,18 +57,19 @@ def create_datesingle(serias, col, placeholder='Select date', **kwargs):
         id=dict(type='filter', id=col),
         placeholder=placeholder,
         value=serias.mean().floor('d').date(),
-        minDate=serias.dt.floor('d').min(),
-        maxDate=serias.dt.floor('d').max(),
+        minDate=serias.min().floor('d'),
+        maxDate=serias.max().floor('d'),
         **kwargs)
 
 def create_daterange(serias, col, placeholder='Select date',  clearable=True, **kwargs):
+    min_date, max_date = serias.min().floor('d'), serias.max().floor('d')
     return dmc.DateRangePicker(
         id=dict(type='filter', id=col),
         clearable=False,
         placeholder=placeholder,
-        value=[serias.min().floor('d').date(), serias.max().floor('d').date()],
-        minDate=serias.dt.floor('d').min(),
-            maxDate=serias.dt.floor('d').max(),
+        value=[min_date.date(), max_date.date()],
+        minDate=min_date,
+            maxDate=max_date,
             **kwargs)
 
 def create_date(serias, col, multi, label=None, **kwargs):
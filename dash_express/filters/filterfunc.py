@@ -1,19 +1,165 @@
-import datetime
+import numpy as np
+import pandas as pd
+
+
+def _is_dictionary(dtype):
+    if not isinstance(dtype, pd.ArrowDtype):
+        return False
+    import pyarrow as pa
+    return pa.types.is_dictionary(dtype.pyarrow_dtype)
+
+
+def codes_filters(serias, values):
+    """Filter a categorical or dictionary-encoded serias by the values.
+
+    The values are translated to a lookup table over the categories once,
+    the mask is a single gather of the table by the integer codes.
+    The last item of the table is for missing values (code -1)."""
+    if isinstance(serias.dtype, pd.CategoricalDtype):
+        lookup = np.append(serias.cat.categories.isin(values), False)
+        return lookup[serias.cat.codes.to_numpy()]
+    import pyarrow as pa
+    masks = [np.zeros(0, dtype=bool)]
+    for chunk in pa.chunked_array(serias.array.__arrow_array__()).chunks:
+        lookup = np.append(chunk.dictionary.to_pandas().isin(values).to_numpy(), False)
+        masks.append(lookup[chunk.indices.fill_null(-1).to_numpy()])
+    return np.concatenate(masks)
+
+
+def _is_encoded(serias):
+    return isinstance(serias.dtype, pd.CategoricalDtype) or _is_dictionary(serias.dtype)
+
+
+class ValueCounts(object):
+    """Row counts of the values of a serias, used to estimate the selectivity of select filters"""
+    def __init__(self, serias, counts=None):
+        if counts is None:
+            counts = serias.value_counts(dropna=False)
+            counts.index = counts.index.astype(object)
+        self.counts = counts
+        self.size = int(counts.sum())
+
+    def append(self, serias, offset):
+        return ValueCounts(serias, self.counts.add(ValueCounts(serias).counts, fill_value=0))
+
+    def share(self, values):
+        """Get the estimated share of rows with one of the values"""
+        return sum(self.counts.get(v, 0) for v in values) / max(self.size, 1)
+
+
+class Quantiles(object):
+    """Percentiles of a numeric serias, used to estimate the selectivity of range filters"""
+    def __init__(self, serias):
+        values = pd.to_numeric(serias, errors='coerce').to_numpy(dtype=float)
+        values = values[~np.isnan(values)]
+        self.valid = len(values) / max(len(serias), 1)
+        self.q = np.quantile(values, np.linspace(0, 1, 101)) if len(values) else np.array([])
+
+    def share(self, start, end):
+        """Get the estimated share of rows with start <= value <= end"""
+        if not len(self.q):
+            return 0.0
+        lo, hi = np.searchsorted(self.q, start, 'left'), np.searchsorted(self.q, end, 'right')
+        return self.valid * (hi - lo) / len(self.q)
 
 
 def select_filters(serias, value):
+    if _is_encoded(serias):
+        return codes_filters(serias, [value])
     return serias == value
 
+select_filters.stats = ValueCounts
+select_filters.selectivity = lambda stats, value: stats.share([value])
 
 def multiselect_filters(serias, value):
+    if _is_encoded(serias):
+        return codes_filters(serias, value)
     return serias.isin(value)
 
+multiselect_filters.stats = ValueCounts
+multiselect_filters.selectivity = lambda stats, value: stats.share(value)
+
 def range_filters(serias, value):
     return (serias >= value[0]) & (serias <= value[1])
 
-def dateselect_filters(serias, value):
-    value = datetime.datetime.strptime(value, '%Y-%m-%d').date()
-    return serias.dt.floor('d') == value
+range_filters.stats = Quantiles
+range_filters.selectivity = lambda stats, value: stats.share(value[0], value[1])
+
+
+class DayIndex(object):
+    """Sorted day ordinals of a datetime serias.
+
+    It is built once per data load, date filters become searchsorted slices on it."""
+    def __init__(self, serias):
+        days = _days(serias)
+        self.order = np.argsort(days, kind='stable')
+        self.days = days[self.order]
+        # NaT is sorted to the end
+        self.size = len(days) - int(np.isnat(self.days).sum())
+
+    def append(self, serias, offset):
+        """Get the index with the rows of serias appended at the offset, the index is not changed.
+
+        The new days are merged into the sorted days, the cost is linear, without sorting all rows"""
+        new = DayIndex(serias)
+        at = np.searchsorted(self.days[:self.size], new.days[:new.size], 'right')
+        index = DayIndex.__new__(DayIndex)
+        index.days = np.concatenate([np.insert(self.days[:self.size], at, new.days[:new.size]),
+                                     self.days[self.size:], new.days[new.size:]])
+        index.order = np.concatenate([np.insert(self.order[:self.size], at, new.order[:new.size] + offset),
+                                      self.order[self.size:], new.order[new.size:] + offset])
+        index.size = self.size + new.size
+        return index
+
+    def share(self, start=None, end=None):
+        """Get the share of rows with start <= day <= end"""
+        days = self.days[:self.size]
+        lo = 0 if start == None else np.searchsorted(days, _day(start), 'left')
+        hi = self.size if end == None else np.searchsorted(days, _day(end), 'right')
+        return (hi - lo) / max(len(self.days), 1)
+
+    def mask(self, start=None, end=None):
+        """Get the mask of rows with start <= day <= end, None is an open bound"""
+        days = self.days[:self.size]
+        lo = 0 if start == None else np.searchsorted(days, _day(start), 'left')
+        hi = self.size if end == None else np.searchsorted(days, _day(end), 'right')
+        mask = np.zeros(len(self.days), dtype=bool)
+        mask[self.order[lo:hi]] = True
+        return mask
+
+
+def _day(value):
+    return np.datetime64(str(value)[:10], 'D')
+
+
+def _days(serias):
+    if getattr(serias.dtype, 'tz', None) != None:
+        serias = serias.dt.tz_localize(None)
+    return serias.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+
+
+def dateselect_filters(serias, value, index=None):
+    # Without the index (e.g. on the rows left by other filters) the days are compared directly
+    if index == None:
+        return _days(serias) == _day(value)
+    return index.mask(value, value)
+
+dateselect_filters.index = DayIndex
+dateselect_filters.stats = DayIndex
+dateselect_filters.selectivity = lambda stats, value: stats.share(value, value)
+
+def daterange_filters(serias, value, index=None):
+    if index == None:
+        # None is an open bound and NaT never matches, as with DayIndex.mask
+        days = _days(serias)
+        mask = ~np.isnat(days)
+        if value[0] != None:
+            mask &= days >= _day(value[0])
+        if value[1] != None:
+            mask &= days <= _day(value[1])
+        return mask
+    return index.mask(value[0], value[1])
 
-def daterange_filters(serias, value):
-    return  (serias >= value[0]) & (serias <= value[1])
\ No newline at end of file
+daterange_filters.index = DayIndex
+daterange_filters.stats = DayIndex
+daterange_filters.selectivity = lambda stats, value: stats.share(value[0], value[1])
@@ -3,9 +3,17 @@ from dash_iconify import DashIconify
 from dash import html, dcc
 import numpy as np
 
+from ..approximate import scale
+
+
+# Aggregations whose value over a sample is scaled to all rows
+ADDITIVE = (np.sum, np.size, np.count_nonzero, len, sum)
+
 
 class KPI(object):
-    """KPI class contains a container representation and the logic for calculating the indicator"""
+    """KPI class contains a container representation and the logic for calculating the indicator.
+    
+    func may be an async function, it is awaited together with the other async render functions of the page"""
     def __init__(self, title, func, icon="flat-ui:settings", **kwargs) -> None:
         self.title = title
         self.func = func
@@ -13,6 +21,12 @@ class KPI(object):
         self.kwargs = kwargs
 
     def render_layout(self, id):
+        """Render the container of the card.
+
+        :param id: id of the card store, dict(type='kpifilter-store', id=...),
+            a string id is accepted as well and wrapped into it"""
+        if not isinstance(id, dict):
+            id = dict(type='kpifilter-store', id=id)
         return dmc.Card(
             dmc.Stack(
                 [
@@ -21,7 +35,7 @@ class KPI(object):
                         DashIconify(icon=self.icon, width=30),], position="apart"),
                     html.Div([
                         dmc.Group(align="flex-end", spacing="xs", mt=25,
-                                id=dict(type='kpi', id=id)),
+                                id=dict(type='kpi', id=id['id'])),
                         dmc.Text('Compared to previous month',
                                 fz="xs", c="dimmed", mt=7)]),
                     dcc.Store(id=id)
@@ -50,6 +64,9 @@ class FastKPI(KPI):
 
     def render_fastkpi_wrapper(self, col, agg_func, pretty_func):
         def wrapper(df):
-            value = pretty_func(agg_func(df[col]))
-            return [dmc.Text(value, size=35)]
+            value = agg_func(df[col])
+            # Sums and counts over a sample are scaled to all rows
+            if agg_func in ADDITIVE:
+                value = value * scale(df)
+            return [dmc.Text(pretty_func(value), size=35)]
         return wrapper
@@ -0,0 +1,378 @@
+"""Load test of DashExpress with a synthetic multi-page app.
+
+    python -m dash_express.loadtest --pages 4 --charts 4 --kpis 2 --workers 2 --concurrency 16 --duration 30
+
+The app is built over generated data, preloaded and served by forked workers (see dash_express.serve).
+Virtual users replay the requests of the browser: the layout, filter changes and page switches
+(the render callback) and data downloads. Throughput, latency percentiles and the memory of
+every worker are reported.
+
+With --url the requests go to an app served elsewhere, it must be built with the same options:
+
+    app = dash_express.loadtest.build_app(pages=4, charts=4)
+"""
+import sys
+import json
+import time
+import random
+import logging
+import socket
+import argparse
+import threading
+import http.client
+
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import dash_mantine_components as dmc
+
+from . import DashExpress, Page, FastKPI
+from .serve import fork_workers, stop_workers
+
+
+REGIONS = ['North', 'South', 'East', 'West', 'Center', 'Islands', 'Mountains', 'Coast']
+ACTIONS = ['layout', 'render', 'download']
+
+
+def synthetic_frame(rows=100_000, seed=0):
+    """Generate the sales-like DataFrame of the synthetic app"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'region': rng.choice(REGIONS, rows),
+        'product': rng.choice([f'product {i}' for i in range(200)], rows),
+        'quantity': rng.integers(1, 100, rows),
+        'price': rng.gamma(2, 50, rows).round(2),
+        'date': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730 * 24, rows), unit='h'),
+    })
+    frame['revenue'] = frame['quantity'] * frame['price']
+    return frame
+
+
+def _bar(df):
+    pv = df.groupby('region', observed=True)['revenue'].sum().reset_index()
+    return go.Figure([go.Bar(x=pv['region'], y=pv['revenue'])])
+
+
+def _line(df):
+    pv = df.set_index('date')['revenue'].resample('W').sum().reset_index()
+    return go.Figure([go.Scatter(x=pv['date'], y=pv['revenue'], mode='lines')])
+
+
+def _histogram(df):
+    counts, edges = np.histogram(df['price'], bins=40)
+    return go.Figure([go.Bar(x=edges[:-1], y=counts)])
+
+
+def _top(df):
+    pv = df.groupby('product', observed=True)['quantity'].sum().nlargest(15).reset_index()
+    return go.Figure([go.Bar(x=pv['quantity'], y=pv['product'], orientation='h')])
+
+
+CHARTS = [_bar, _line, _histogram, _top]
+KPIS = [('revenue', np.sum, lambda x: f'{x:,.0f}'), ('price', np.mean, lambda x: f'{x:.2f}'),
+        ('quantity', np.sum, lambda x: f'{x:,}')]
+FILTERS = [('region', True), ('product', False), ('quantity', True), ('date', True)]
+
+
+def _points(df):
+    import geopandas as gpd
+    rng = np.random.default_rng(len(df))
+    return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(82.9 + rng.random(len(df)) / 10,
+                                                             55 + rng.random(len(df)) / 10))
+
+
+def build_app(pages=2, charts=4, kpis=2, maps=0, filters=4, rows=100_000, approximate=None, **kwargs):
+    """Build the synthetic app: every page has its own generated frame, charts, KPI, maps and autofilters.
+
+    Maps need geopandas, the points are spread around the default map bounds.
+    With approximate (rows of the sample) the pages are approximate, stratified by region.
+
+    :param kwargs: DashExpress parameters, the responses are compressed by default (compress='builtin')"""
+    kwargs.setdefault('compress', 'builtin')
+    app = DashExpress(logo='Load test', **kwargs)
+    for number in range(pages):
+        get_df = lambda seed=number: synthetic_frame(rows, seed)
+        if maps:
+            get_df = lambda seed=number: _points(synthetic_frame(rows, seed))
+        page = Page(app=app, url_path='/' if number == 0 else f'/page-{number}', name=f'Page {number}',
+                    get_df=get_df, title=f'Page {number}', approximate=approximate, 
+                    approximate_by='region' if approximate else None)
+        # The ids do not depend on the process, the app served elsewhere (--url) has the same ones
+        cards = [page.add_kpi(FastKPI(col, agg_func=agg, pretty_func=pretty), id=f'kpi-{i}')
+                 for i, (col, agg, pretty) in enumerate((KPIS * kpis)[:kpis])]
+        cards += [page.add_graph(render_func=CHARTS[i % len(CHARTS)], id=f'chart-{i}') for i in range(charts)]
+        cards += [page.add_map(geojson_func=lambda gdf: gdf.head(500).__geo_interface__, id=f'map-{i}') 
+                  for i in range(maps)]
+        page.layout = dmc.SimpleGrid(cards, cols=2)
+        for col, multi in FILTERS[:filters]:
+            page.add_autofilter(col, multi=multi)
+    app.compile_layout()
+    return app
+
+
+class Scenario(object):
+    """The requests of the virtual users against the synthetic app, built from the app itself
+
+    :param app: the app built by build_app with the options of the tested app
+    :param mix: relative frequency of the actions, {'layout': 1, 'render': 8, 'download': 1}"""
+    def __init__(self, app, mix, seed=0):
+        self.app = app
+        self.mix = mix
+        self.keys = {name: self._key(*needles) for name, needles in
+                     [('layout', ['layout-store.data']),
+                      ('render', ['"type":"graph"}.figure', '"type":"kpi"}.children']),
+                      ('download', ['"type":"download-frame"'])]}
+        self.pages = {}
+        for url, page in app.PAGES.items():
+            with app.server.app_context():
+                df = page.get_df_func()
+            self.pages[url] = (page, self._domain(page, df))
+        self.local = threading.local()
+        self.seed = seed
+
+    def _key(self, *needles):
+        for key in self.app.callback_map:
+            if all(needle in key for needle in needles):
+                return key
+        return None
+
+    def _domain(self, page, df):
+        domain = {}
+        for col in page.FILTERS_FUNC:
+            serias = df[col]
+            if pd.api.types.is_datetime64_any_dtype(serias.dtype):
+                domain[col] = ('date', sorted(serias.dt.strftime('%Y-%m-%d').unique()))
+            elif pd.api.types.is_numeric_dtype(serias.dtype):
+                domain[col] = ('range', (serias.min().item(), serias.max().item()))
+            else:
+                domain[col] = ('select', sorted(serias.astype(str).unique()))
+        return domain
+
+    @property
+    def random(self):
+        if not hasattr(self.local, 'random'):
+            self.local.random = random.Random(f'{self.seed}-{threading.get_ident()}')
+        return self.local.random
+
+    def filters(self, url):
+        """Random values for about half of the filters of the page"""
+        rnd, values = self.random, {}
+        page, domain = self.pages[url]
+        for col, (kind, options) in domain.items():
+            if rnd.random() < 0.5:
+                continue
+            single = page.FILTERS_FUNC[col].__name__ in ('select_filters', 'dateselect_filters')
+            if kind == 'range':
+                values[col] = sorted(rnd.randint(int(options[0]), int(options[1])) for _ in range(2))
+            elif single:
+                values[col] = rnd.choice(options)
+            elif kind == 'select':
+                values[col] = rnd.sample(options, rnd.randint(1, 3))
+            else:
+                values[col] = sorted(rnd.sample(options, 2))
+        return values
+
+    def state(self, filters):
+        return {'filters': filters, 'cross': {}}
+
+    def request(self):
+        """Pick the next action of a virtual user: (action, body)"""
+        rnd = self.random
+        actions = [action for action in ACTIONS if self.mix.get(action) and self.keys[action]]
+        action = rnd.choices(actions, [self.mix[action] for action in actions])[0]
+        url = rnd.choice(list(self.pages))
+        return action, getattr(self, f'{action}_body')(url)
+
+    def layout_body(self, url):
+        return {'output': self.keys['layout'], 'outputs': {'id': 'layout-store', 'property': 'data'},
+                'inputs': [{'id': 'layout-store', 'property': 'data', 'value': None}],
+                'state': [], 'changedPropIds': []}
+
+    def render_body(self, url):
+        page, _ = self.pages[url]
+        ids = [[{'id': {'type': kind, 'id': id}, 'property': prop} for id in funcs if id != 'default']
+               for kind, prop, funcs in [('graph', 'figure', page.RENDER_FUNC), ('kpi', 'children', page.RENDER_FUNC_KPI),
+                                         ('geojson', 'data', page.GEOJSON_FUNC)]]
+        inputs = [{'id': 'contentfilter-store', 'property': 'data', 'value': self.state(self.filters(url))}]
+        if self.app.APPROXIMATE_OPPORTUNITY:
+            marker, timer = [{'type': 'approximate', 'page': url}], [{'type': 'approximate-refine', 'page': url}]
+            if not page.approximate:
+                marker, timer = [], []
+            ids += [[{'id': id, 'property': 'style'} for id in marker], [{'id': id, 'property': 'disabled'} for id in timer]]
+            inputs.append([{'id': id, 'property': 'n_intervals', 'value': None} for id in timer])
+        return {'output': self.keys['render'], 'outputs': ids, 'inputs': inputs,
+                'state': [{'id': 'url-store', 'property': 'pathname', 'value': url}],
+                'changedPropIds': ['contentfilter-store.data']}
+
+    def download_body(self, url):
+        action = {'type': 'download-frame-action', 'page': url}
+        return {'output': self.keys['download'],
+                'outputs': [{'id': {'type': 'download-frame', 'page': url}, 'property': 'data'},
+                            {'id': action, 'property': 'color'}],
+                'inputs': [{'id': action, 'property': 'n_clicks', 'value': 1}],
+                'state': [{'id': 'contentfilter-store', 'property': 'data', 'value': self.state(self.filters(url))},
+                          {'id': action, 'property': 'id', 'value': action}],
+                'changedPropIds': [f'{json.dumps(action, separators=(",", ":"), sort_keys=True)}.n_clicks']}
+
+
+def post(base, body, timeout=60):
+    """Send a callback request, returns the status and the size of the (compressed) response"""
+    parts = urlsplit(base)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    try:
+        connection.request('POST', parts.path.rstrip('/') + '/_dash-update-component', json.dumps(body),
+                           {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+        response = connection.getresponse()
+        return response.status, len(response.read())
+    finally:
+        connection.close()
+
+
+def run(scenario, base, concurrency=8, duration=10, requests=None):
+    """Replay the scenario with concurrent virtual users, returns {action: [(seconds, status, size)]}"""
+    results = {action: [] for action in ACTIONS}
+    guard = threading.Lock()
+    deadline = time.monotonic() + duration
+    sent = [0]
+
+    def user():
+        while time.monotonic() < deadline:
+            with guard:
+                if requests != None and sent[0] >= requests:
+                    return
+                sent[0] += 1
+            action, body = scenario.request()
+            start = time.perf_counter()
+            try:
+                status, size = post(base, body)
+            except (OSError, http.client.HTTPException):
+                status, size = None, 0
+            with guard:
+                results[action].append((time.perf_counter() - start, status, size))
+
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def memory(pid):
+    """Resident and peak resident memory of the process in MB, from /proc"""
+    values = {}
+    try:
+        with open(f'/proc/{pid}/status') as file:
+            for line in file:
+                name, _, value = line.partition(':')
+                if name in ('VmRSS', 'VmHWM'):
+                    values[name] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return values.get('VmRSS'), values.get('VmHWM')
+
+
+def report(results, elapsed, workers=(), file=sys.stdout):
+    """Print the latency and the errors of every action, returns the number of errors"""
+    total = sum(len(rows) for rows in results.values())
+    failed = 0
+    print(f'{"action":<10}{"requests":>10}{"errors":>8}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"KB":>8}', file=file)
+    for action, rows in results.items():
+        if not rows:
+            continue
+        seconds = np.array([row[0] for row in rows]) * 1000
+        errors = sum(row[1] not in (200, 204) for row in rows)
+        failed += errors
+        p50, p90, p99 = np.percentile(seconds, [50, 90, 99])
+        size = np.mean([row[2] for row in rows]) / 1024
+        print(f'{action:<10}{len(rows):>10}{errors:>8}{p50:>10.1f}{p90:>10.1f}{p99:>10.1f}{size:>8.1f}', file=file)
+    print(f'{total} requests in {elapsed:.1f} s, {total / elapsed:.1f} req/s', file=file)
+    for pid in workers:
+        rss, peak = memory(pid)
+        if rss != None:
+            print(f'worker {pid}: rss {rss:.1f} MB, peak {peak:.1f} MB', file=file)
+    return failed
+
+
+def _free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def _wait(base, timeout=60):
+    """Wait until the app answers the index page with 200, retrying with a growing delay"""
+    parts = urlsplit(base)
+    deadline = time.monotonic() + timeout
+    delay = 0.1
+    while True:
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise TimeoutError(f'{base} does not respond')
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=min(5, left))
+        try:
+            connection.request('GET', parts.path or '/')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            connection.close()
+        time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+        delay = min(delay * 2, 2)
+
+
+def _mix(value):
+    mix = {}
+    for part in value.split(','):
+        action, _, weight = part.partition('=')
+        if action not in ACTIONS:
+            raise argparse.ArgumentTypeError(f'unknown action {action}, expected {", ".join(ACTIONS)}')
+        mix[action] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test of DashExpress with a synthetic multi-page app')
+    parser.add_argument('--pages', type=int, default=2)
+    parser.add_argument('--charts', type=int, default=4, help='charts per page')
+    parser.add_argument('--kpis', type=int, default=2, help='KPI cards per page')
+    parser.add_argument('--maps', type=int, default=0, help='maps per page, requires geopandas')
+    parser.add_argument('--filters', type=int, default=4, help='autofilters per page, up to 4')
+    parser.add_argument('--rows', type=int, default=100_000, help='rows of the frame of a page')
+    parser.add_argument('--approximate', type=int, default=None, help='rows of the sample of approximate pages')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4, help='threads per worker')
+    parser.add_argument('--concurrency', type=int, default=8, help='virtual users')
+    parser.add_argument('--duration', type=float, default=10, help='seconds')
+    parser.add_argument('--requests', type=int, default=None, help='stop after this number of requests')
+    parser.add_argument('--mix', type=_mix, default={'layout': 1, 'render': 8, 'download': 1},
+                        help='relative frequency of the actions, e.g. layout=1,render=8,download=1')
+    parser.add_argument('--url', default=None, help='load an app served elsewhere instead of forking the workers')
+    parser.add_argument('--max-errors', type=int, default=None, help='exit with status 1 above this number of errors')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    app = build_app(args.pages, args.charts, args.kpis, args.maps, args.filters, args.rows, args.approximate)
+    scenario = Scenario(app, args.mix, args.seed)
+    workers, base = [], args.url
+    if base == None:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        port = _free_port(args.host)
+        workers = fork_workers(app.preload(), args.host, port, args.workers, args.threads)
+        base = f'http://{args.host}:{port}/'
+    try:
+        _wait(base)
+        start = time.perf_counter()
+        results = run(scenario, base, args.concurrency, args.duration, args.requests)
+        errors = report(results, time.perf_counter() - start, workers)
+    finally:
+        stop_workers(workers)
+    return 1 if args.max_errors != None and errors > args.max_errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
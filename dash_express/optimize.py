@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+
+def _arrow_strings():
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+
+def _compact(serias, category_ratio, downcast=False):
+    dtype = serias.dtype
+    if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+        return serias
+    if pd.api.types.is_integer_dtype(dtype):
+        if downcast:
+            return pd.to_numeric(serias, downcast='integer')
+        # int32 is the narrowest type kept by default, products of int8/int16 values overflow
+        info = np.iinfo(np.int32)
+        if isinstance(dtype, np.dtype) and dtype.itemsize > 4 and len(serias) and info.min <= serias.min() and serias.max() <= info.max:
+            return serias.astype(np.int32)
+        return serias
+    if pd.api.types.is_float_dtype(dtype):
+        return pd.to_numeric(serias, downcast='float') if downcast else serias
+    if dtype == object or pd.api.types.is_string_dtype(dtype):
+        try:
+            nunique = serias.nunique()
+        except TypeError:
+            # unhashable values
+            return serias
+        if len(serias) and nunique <= max(len(serias) * category_ratio, 1):
+            return serias.astype('category')
+        if _arrow_strings() and pd.api.types.infer_dtype(serias, skipna=True) == 'string':
+            return serias.astype('string[pyarrow]')
+    return serias
+
+
+def optimize_frame(df, category_ratio=0.05, downcast=False):
+    """Reduce the memory of a DataFrame by compacting the column types.
+
+    Object columns with few unique values (at most category_ratio of the rows) become
+    category, other string columns become Arrow-backed strings if pyarrow is installed,
+    int64 columns become int32 if their values fit, floats are kept.
+
+    With downcast=True integers and floats are downcast to the smallest type holding their values
+    (int8, float32). Note that arithmetic on them may overflow or lose precision, e.g. int8 * 1000.
+
+    :param df: DataFrame
+    :param category_ratio: the maximum share of unique values for a category column
+    :param downcast: downcast numeric columns to the smallest types
+
+    Returns the optimized DataFrame and a report:
+    {'before': bytes, 'after': bytes, 'saved': bytes, 'columns': {col: 'int64 -> int16'}}"""
+    before = int(df.memory_usage(deep=True).sum())
+    df = df.copy(deep=False)
+    columns = {}
+    for col in df.columns:
+        serias = df[col]
+        compact = _compact(serias, category_ratio, downcast)
+        if compact.dtype != serias.dtype:
+            df[col] = compact
+            columns[col] = f'{serias.dtype} -> {compact.dtype}'
+    after = int(df.memory_usage(deep=True).sum())
+    return df, {'before': before, 'after': after, 'saved': before - after, 'columns': columns}
+
+
+def _cast(serias, dtype):
+    """Cast the values to the dtype if they keep their values, else return them as they are"""
+    try:
+        cast = serias.astype(dtype)
+        if cast.astype(serias.dtype).equals(serias):
+            return cast
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return serias
+
+
+def append_frame(df, rows):
+    """Append rows to a DataFrame keeping its column types.
+
+    New values are added to the categories, so the codes of the existing rows stay valid.
+    The other columns of the rows are cast to the types of the DataFrame (e.g. the int32 
+    of optimize_frame) if their values fit, otherwise pandas widens the column.
+
+    :param df: DataFrame
+    :param rows: DataFrame with the new rows"""
+    if rows is None or len(rows) == 0:
+        return df.copy(deep=False)
+    df, rows = df.copy(deep=False), rows.copy(deep=False)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and col in rows.columns:
+            new = pd.Index(rows[col].dropna().unique()).difference(df[col].cat.categories)
+            if len(new):
+                df[col] = df[col].cat.add_categories(new)
+            rows[col] = rows[col].astype(df[col].dtype)
+        elif col in rows.columns and rows[col].dtype != df[col].dtype:
+            rows[col] = _cast(rows[col], df[col].dtype)
+    return pd.concat([df, rows], ignore_index=True)
+
+
+def _readonly(values):
+    values = values.copy()
+    values.flags.writeable = False
+    return values
+
+
+def freeze_frame(df, category_ratio=0.05):
+    """Lay out a DataFrame for sharing between forked workers (copy-on-write).
+
+    Every column gets its own read-only numpy buffer, object columns with few unique values 
+    become category, the codes are not touched by reference counting. In-place changes of 
+    the frozen frame raise ValueError instead of copying the memory pages in a worker.
+
+    :param df: DataFrame
+    :param category_ratio: the maximum share of unique values for a category column
+
+    Returns the frozen DataFrame and the list of object columns left"""
+    columns, objects = {}, []
+    for col in df.columns:
+        serias = df[col]
+        if serias.dtype == object:
+            compact = _compact(serias, category_ratio)
+            if isinstance(compact.dtype, pd.CategoricalDtype):
+                serias = compact
+        if isinstance(serias.dtype, pd.CategoricalDtype):
+            columns[col] = pd.Categorical.from_codes(_readonly(serias.cat.codes.to_numpy()), dtype=serias.dtype)
+        elif isinstance(serias.dtype, np.dtype) and serias.dtype != object:
+            columns[col] = _readonly(serias.to_numpy())
+        else:
+            columns[col] = serias.array
+            objects += [col] if serias.dtype == object else []
+    frozen = pd.DataFrame(columns, index=df.index, copy=False)
+    frozen.attrs = dict(df.attrs)
+    return frozen, objects
@@ -0,0 +1,116 @@
+import io
+import os
+import time
+import uuid
+import hashlib
+import logging
+
+from flask_caching.backends import FileSystemCache
+
+
+_REF = 'dash_express.arrow'
+
+
+class PickleSerializer(object):
+    """Store DataFrames in the app cache as they are, the cache backend pickles them"""
+    def get(self, cache, key):
+        return cache.get(key)
+
+    def set(self, cache, key, df, timeout=None):
+        cache.set(key, df, timeout=timeout)
+
+
+class ArrowSerializer(object):
+    """Store DataFrames in the app cache in the Arrow IPC (Feather v2) format.
+
+    With FileSystemCache the frame is written to a file next to the cache folder
+    (<CACHE_DIR>-frames) and read with a memory map, the cache holds only the file name.
+    Other backends hold the IPC bytes. Frames that Arrow can not convert
+    (e.g. mixed-type object columns) are pickled.
+
+    Requires pyarrow: pip install pyarrow
+
+    :param compression: None | 'lz4' | 'zstd', uncompressed files are mapped, not read into memory before the conversion
+    :type compression: string"""
+    def __init__(self, compression='lz4'):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('ArrowSerializer requires pyarrow: pip install pyarrow')
+        self.compression = compression
+
+    def _options(self):
+        import pyarrow as pa
+        return pa.ipc.IpcWriteOptions(compression=self.compression)
+
+    def _write(self, sink, table):
+        import pyarrow as pa
+        with pa.ipc.new_file(sink, table.schema, options=self._options()) as writer:
+            writer.write_table(table)
+
+    def _folder(self, cache):
+        backend = cache.cache
+        if isinstance(backend, FileSystemCache):
+            return backend._path.rstrip(os.sep) + '-frames'
+        return None
+
+    def get(self, cache, key):
+        import pyarrow as pa
+        value = cache.get(key)
+        if not (isinstance(value, tuple) and len(value) == 3 and value[0] == _REF):
+            return value
+        _, kind, payload = value
+        if kind == 'file':
+            try:
+                source = pa.memory_map(payload)
+            except FileNotFoundError:
+                return None
+        else:
+            source = pa.BufferReader(payload)
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+    def set(self, cache, key, df, timeout=None):
+        import pyarrow as pa
+        try:
+            table = pa.Table.from_pandas(df)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as error:
+            logging.getLogger(__name__).warning('%s is pickled, Arrow can not convert it: %s', key, error)
+            cache.set(key, df, timeout=timeout)
+            return
+        folder = self._folder(cache)
+        if folder == None:
+            sink = io.BytesIO()
+            self._write(sink, table)
+            cache.set(key, (_REF, 'bytes', sink.getvalue()), timeout=timeout)
+            return
+        os.makedirs(folder, exist_ok=True)
+        self._remove_expired(folder, timeout)
+        path = os.path.join(folder, hashlib.sha1(key.encode()).hexdigest() + '.arrow')
+        # Readers map a complete file only
+        tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+        self._write(tmp, table)
+        os.replace(tmp, path)
+        cache.set(key, (_REF, 'file', path), timeout=timeout)
+
+    def _remove_expired(self, folder, timeout):
+        if not timeout:
+            return
+        now = time.time()
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            try:
+                if os.path.getmtime(path) < now - timeout:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def get_serializer(serializer):
+    """Get the frame serializer by name: None | 'pickle' | 'arrow', or a serializer instance"""
+    if serializer == None or serializer == 'pickle':
+        return PickleSerializer()
+    if serializer == 'arrow':
+        return ArrowSerializer()
+    if isinstance(serializer, str):
+        raise ValueError("frame_serializer must be 'pickle', 'arrow' or a serializer instance")
+    return serializer
@@ -0,0 +1,110 @@
+"""Preload-and-fork server for DashExpress apps.
+
+The app is imported and preloaded (DashExpress.preload) in the master process, then 
+the workers are forked and share the loaded data copy-on-write:
+
+    python -m dash_express.serve myapp:app --workers 4 --port 8050
+
+gunicorn is used if it is installed, otherwise the workers are forked here and serve 
+the same listening socket with the werkzeug server.
+"""
+import os
+import sys
+import signal
+import argparse
+import importlib
+
+
+def load_app(target):
+    """Import the DashExpress app from 'module:attribute'"""
+    module, _, attr = target.partition(':')
+    sys.path.insert(0, os.getcwd())
+    return getattr(importlib.import_module(module), attr or 'app')
+
+
+def check_cache(app, workers):
+    """Warn if several workers would each use their own in-process cache"""
+    if workers > 1 and app.single_flight.mode == 'local':
+        app.logger.warning('%d workers with an in-process cache: the data versions, app.invalidate and the '
+                           'cached results only reach the worker handling the request, pass a shared cache '
+                           '(FileSystemCache, RedisCache) to DashExpress', workers)
+
+
+def serve_gunicorn(app, host, port, workers, threads):
+    check_cache(app, workers)
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('preload_app', True)
+
+        def load(self):
+            return app.server
+
+    Application().run()
+
+
+def fork_workers(app, host, port, workers, threads):
+    """Fork the workers serving the app on one listening socket, returns their pids"""
+    from werkzeug.serving import make_server
+
+    check_cache(app, workers)
+    server = make_server(host, port, app.server, threaded=threads > 1)
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, lambda *args: os._exit(0))
+            server.serve_forever()
+            os._exit(0)
+        children.append(pid)
+    server.socket.close()
+    return children
+
+
+def stop_workers(children):
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+
+def serve_fork(app, host, port, workers, threads):
+    children = fork_workers(app, host, port, workers, threads)
+    app.logger.info('Serving on http://%s:%s with %d workers', host, port, workers)
+
+    def stop(*args):
+        stop_workers(children)
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Preload a DashExpress app and fork the workers')
+    parser.add_argument('app', help="module:attribute of the DashExpress app, e.g. myapp:app")
+    parser.add_argument('--host', default=os.getenv('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '8050')))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--no-freeze', action='store_true', help='do not freeze the loaded frames')
+    args = parser.parse_args(argv)
+
+    app = load_app(args.app).preload(freeze=not args.no_freeze)
+    try:
+        import gunicorn
+    except ImportError:
+        return serve_fork(app, args.host, args.port, args.workers, args.threads)
+    return serve_gunicorn(app, args.host, args.port, args.workers, args.threads)
+
+
+if __name__ == '__main__':
+    main()